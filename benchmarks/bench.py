@@ -0,0 +1,142 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+## Throughput and latency benchmarks for API and Socket against the local mock server.
+## Run from the repository root with `python -m benchmarks.bench`.
+
+import argparse
+import threading
+import time
+import tracemalloc
+
+import screepsapi
+from screepsapi import codec
+from benchmarks.mockserver import MockServer, TOKEN
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+def allocated(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, count, elapsed, latencies=None, peak=None, decode=None):
+    line = '%-28s %8d ops %10.1f ops/s' % (name, count, count / elapsed)
+    if latencies:
+        line += '   p50 %7.2f ms   p99 %7.2f ms' % (percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000)
+    if decode is not None:
+        line += '   decode %7.2f ms' % (decode * 1000)
+    if peak is not None:
+        line += '   peak %8.1f KiB' % (peak / 1024.0)
+    print(line)
+
+
+def bench_call(name, func, iterations, decode=None):
+    func()
+    latencies = []
+    start = time.time()
+    for _ in range(iterations):
+        began = time.time()
+        func()
+        latencies.append(time.time() - began)
+    elapsed = time.time() - start
+    decode_time = None
+    if decode is not None:
+        began = time.time()
+        for _ in range(iterations):
+            decode()
+        decode_time = (time.time() - began) / iterations
+    report(name, iterations, elapsed, latencies, allocated(func), decode_time)
+
+
+def bench_concurrent(name, api, func, iterations):
+    start = time.time()
+    count = sum(1 for _, ret in api.bulk(lambda i: func(), range(iterations)) if not isinstance(ret, Exception))
+    report(name, count, time.time() - start)
+
+
+class BenchSocket(screepsapi.Socket):
+
+    def __init__(self, duration, **kwargs):
+        screepsapi.Socket.__init__(self, **kwargs)
+        self.duration = duration
+        self.latencies = []
+        self.started = None
+
+    def on_message(self, ws, message):
+        if self.started is None:
+            self.started = time.time()
+            threading.Timer(self.duration, ws.close).start()
+        began = time.time()
+        screepsapi.Socket.on_message(self, ws, message)
+        self.latencies.append(time.time() - began)
+
+
+## no-op handlers on every channel the mock server sends, so messages are parsed and dispatched
+## instead of being dropped unwanted
+def handle_all(sock):
+    for pattern in ('room:**', 'user:**'):
+        sock.on(pattern, lambda ws, channel, data: None)
+    return sock
+
+
+def bench_socket_inline(server, iterations):
+    sock = handle_all(screepsapi.Socket(token=TOKEN))
+    messages = server.messages
+    latencies = []
+    start = time.time()
+    for i in range(iterations):
+        began = time.time()
+        sock.on_message(None, messages[i % len(messages)])
+        latencies.append(time.time() - began)
+    elapsed = time.time() - start
+    peak = allocated(lambda: [sock.on_message(None, m) for m in messages])
+    report('Socket.on_message (inline)', iterations, elapsed, latencies, peak)
+
+
+def bench_socket_stream(server, duration):
+    sock = handle_all(BenchSocket(duration, token=TOKEN, host=server.host, secure=False, reconnect=False))
+    sock.connect()
+    if sock.started is None:
+        print('Socket.on_message (stream)   no messages received')
+        return
+    elapsed = time.time() - sock.started
+    report('Socket.on_message (stream)', len(sock.latencies), elapsed, sock.latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark screepsapi against a local mock server')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds to stream socket messages')
+    parser.add_argument('--rate', type=int, default=2000, help='socket messages per second')
+    args = parser.parse_args()
+
+    server = MockServer(message_rate=args.rate).start()
+    api = screepsapi.API(token=TOKEN, host=server.host, secure=False)
+    body = server.payloads['/api/game/room-objects']
+    orders = server.payloads['/api/game/market/orders']
+    print('json backend: %s' % (codec.use_backend(codec.backend) if codec.backend else codec.use_backend()))
+    try:
+        bench_call('API.req (version)', api.version, args.iterations)
+        bench_call('API.room_objects', lambda: api.room_objects('W1N1'), args.iterations, lambda: api.parse(body))
+        bench_call('API.market_order_by_type', lambda: api.market_order_by_type('energy'), args.iterations, lambda: api.parse(orders))
+        bench_call('API.memory', api.memory, args.iterations // 4 or 1, lambda: codec.decode_payload(server.memory))
+        bench_call('API.get_segment', lambda: api.get_segment(0), args.iterations)
+        bench_concurrent('API.req (version, bulk)', api, api.version, args.iterations * 5)
+        bench_socket_inline(server, args.iterations * 50)
+        bench_socket_stream(server, args.duration)
+    finally:
+        api.close()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+## Import time budget for `import screepsapi`, measured with `python -X importtime` in fresh
+## interpreters. Run from the repository root with `python -m benchmarks.import_time`; exits
+## non-zero when the budget is exceeded or a lazily loaded module was imported up front.
+
+import argparse
+import os
+import subprocess
+import sys
+
+## milliseconds screepsapi may add on top of requests, which every REST call needs anyway
+DEFAULT_BUDGET = 10.0
+DEFAULT_RUNS = 7
+
+## modules that must only load when the feature using them is first used
+LAZY_MODULES = ('websocket', 'websockets', 'asyncio', 'concurrent.futures', 'numpy', 'pyarrow', 'yaml',
+                'orjson', 'ujson', 'screepsapi.asyncapi', 'screepsapi.asyncsocket', 'screepsapi.dispatch',
+                'screepsapi.roomstate', 'screepsapi.metrics', 'screepsapi.cache', 'screepsapi.terrain',
+                'screepsapi.columnar')
+
+
+## bytecode has to be cached, or compiling screepsapi.py would be counted as import time
+ENV = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE')
+
+
+## cumulative import time in microseconds per top level module, with requests imported first so
+## the screepsapi entry only counts what screepsapi adds on top of it
+def measure():
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import requests; import screepsapi'],
+                          stderr=subprocess.PIPE, universal_newlines=True, check=True, env=ENV)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = times.get(name.strip(), 0) + int(cumulative)
+    return times
+
+
+def loaded():
+    code = 'import sys, screepsapi; print("\\n".join(sorted(sys.modules)))'
+    proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True, check=True,
+                          env=ENV)
+    modules = set(proc.stdout.split())
+    return [name for name in LAZY_MODULES if name in modules]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of screepsapi')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='milliseconds allowed on top of requests')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+
+    ## the first run writes the bytecode cache, the fastest of the rest is the least disturbed
+    measure()
+    runs = [measure() for _ in range(args.runs)]
+    total = min(run['screepsapi'] + run['requests'] for run in runs) / 1000.0
+    own = min(run['screepsapi'] for run in runs) / 1000.0
+    print('import screepsapi            %8.2f ms' % total)
+    print('  without requests           %8.2f ms   budget %.2f ms' % (own, args.budget))
+
+    failed = False
+    if own > args.budget:
+        print('over budget by %.2f ms' % (own - args.budget))
+        failed = True
+    eager = loaded()
+    if eager:
+        print('imported up front: %s' % ', '.join(eager))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
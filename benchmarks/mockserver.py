@@ -0,0 +1,240 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+## Local stand-in for a Screeps server: canned REST payloads plus a websocket endpoint
+## that streams console and room messages at a fixed rate.
+
+from base64 import b64encode
+import gzip
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+USER_ID = '5a0000000000000000000001'
+TOKEN = 'f' * 40
+
+STRUCTURE_TYPES = ('spawn', 'extension', 'road', 'constructedWall', 'rampart', 'tower', 'container', 'link')
+RESOURCES = ('energy', 'H', 'O', 'U', 'L', 'K', 'Z', 'X', 'G', 'power')
+
+
+def room_objects(count=1500, seed=1):
+    rnd = random.Random(seed)
+    objects = []
+    for i in range(count):
+        kind = rnd.choice(STRUCTURE_TYPES + ('creep',) * 3)
+        obj = {'_id': '%024x' % i, 'type': kind, 'room': 'W1N1', 'x': rnd.randrange(50), 'y': rnd.randrange(50),
+               'hits': rnd.randrange(1, 300000), 'hitsMax': 300000, 'user': USER_ID}
+        if kind in ('creep', 'container', 'spawn', 'extension', 'tower'):
+            obj['store'] = {'energy': rnd.randrange(300)}
+            obj['storeCapacity'] = 300
+        if kind == 'creep':
+            obj['name'] = 'creep%d' % i
+            obj['body'] = [{'type': rnd.choice(('work', 'carry', 'move')), 'hits': 100} for _ in range(rnd.randrange(3, 50))]
+            obj['fatigue'] = 0
+        objects.append(obj)
+    return {'ok': 1, 'objects': objects, 'users': {USER_ID: {'_id': USER_ID, 'username': 'bench'}}}
+
+
+def memory_blob(creeps=5000, seed=2):
+    rnd = random.Random(seed)
+    memory = {'creeps': {}, 'rooms': {}, 'stats': {'cpu': {'used': 12.5, 'bucket': 10000}}}
+    for i in range(creeps):
+        memory['creeps']['creep%d' % i] = {'role': rnd.choice(('harvester', 'hauler', 'upgrader')), 'home': 'W1N1',
+                                           'path': ''.join(rnd.choice('12345678') for _ in range(40))}
+    return memory
+
+
+def gz_payload(value):
+    return 'gz:' + b64encode(gzip.compress(json.dumps(value).encode('utf-8'))).decode('ascii')
+
+
+def market_orders(count=5000, seed=3):
+    rnd = random.Random(seed)
+    return {'ok': 1, 'list': [
+        {'_id': '%024x' % i, 'created': 1000 + i, 'type': rnd.choice(('buy', 'sell')), 'amount': rnd.randrange(1, 10000),
+         'remainingAmount': rnd.randrange(1, 10000), 'resourceType': 'energy', 'price': round(rnd.uniform(0.01, 2), 3),
+         'roomName': 'W%dN%d' % (rnd.randrange(60), rnd.randrange(60))}
+        for i in range(count)]}
+
+
+def socket_messages(count=200, seed=4):
+    rnd = random.Random(seed)
+    messages = []
+    for i in range(count):
+        if i % 4 == 0:
+            payload = ['user:%s/console' % USER_ID, {'messages': {'log': ['tick %d' % i, 'cpu %.2f' % rnd.random()], 'results': []}, 'shard': 'shard0'}]
+            messages.append(json.dumps(payload))
+        else:
+            room = 'W%dN%d' % (rnd.randrange(10), rnd.randrange(10))
+            diff = dict(('%024x' % rnd.randrange(5000), {'x': rnd.randrange(50), 'y': rnd.randrange(50), 'hits': rnd.randrange(5000)})
+                        for _ in range(rnd.randrange(5, 60)))
+            payload = ['room:shard0/%s' % room, {'objects': diff, 'gameTime': 1000 + i, 'info': {'mode': 'world'}}]
+            messages.append('gz:' + b64encode(zlib.compress(json.dumps(payload).encode('utf-8'))).decode('ascii'))
+    return messages
+
+
+def ws_frame(payload, opcode=1):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def ws_read(conn):
+    def recv(n):
+        data = b''
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+    first, second = struct.unpack('!BB', recv(2))
+    length = second & 0x7f
+    if length == 126:
+        length = struct.unpack('!H', recv(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', recv(8))[0]
+    mask = recv(4) if second & 0x80 else b'\0\0\0\0'
+    payload = bytearray(recv(length))
+    for i in range(length):
+        payload[i] ^= mask[i % 4]
+    return first & 0x0f, bytes(payload)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, status=200, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-RateLimit-Limit', '1000000')
+        self.send_header('X-RateLimit-Remaining', '999999')
+        self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.reply(self.server.payloads.get(urlparse(self.path).path, b'{"ok":1}'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/socket/websocket':
+            return self.websocket()
+        body = self.server.payloads.get(url.path)
+        if body is None:
+            return self.reply({'error': 'not found'}, status=404)
+        self.reply(body)
+
+    def websocket(self):
+        accept = b64encode(hashlib.sha1((self.headers['Sec-WebSocket-Key'] + WS_GUID).encode('ascii')).digest())
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept.decode('ascii'))
+        self.end_headers()
+        self.wfile.flush()
+        conn = self.connection
+        authed = threading.Event()
+        closed = threading.Event()
+        lock = threading.Lock()
+
+        def send(payload, opcode=1):
+            with lock:
+                conn.sendall(ws_frame(payload, opcode))
+
+        def reader():
+            try:
+                while not closed.is_set():
+                    opcode, payload = ws_read(conn)
+                    if opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        send(payload, 0xA)
+                    elif opcode == 0x1 and payload.startswith(b'auth '):
+                        send(b'auth ok ' + TOKEN.encode('ascii'))
+                        authed.set()
+            except (EOFError, socket.error):
+                pass
+            closed.set()
+
+        thread = threading.Thread(target=reader)
+        thread.daemon = True
+        thread.start()
+        authed.wait(10)
+        messages = [m.encode('utf-8') for m in self.server.messages]
+        rate = self.server.message_rate
+        sent = 0
+        start = time.time()
+        try:
+            while not closed.is_set():
+                due = int((time.time() - start) * rate)
+                while sent < due:
+                    send(messages[sent % len(messages)])
+                    sent += 1
+                time.sleep(0.005)
+        except socket.error:
+            pass
+        closed.set()
+        self.close_connection = True
+
+
+class MockServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, message_rate=2000):
+        HTTPServer.__init__(self, ('127.0.0.1', port), MockHandler)
+        self.message_rate = message_rate
+        self.memory = gz_payload(memory_blob())
+        self.messages = socket_messages()
+        self.payloads = {
+            '/api/version': {'ok': 1, 'package': 1, 'protocol': 14, 'serverData': {'shards': ['shard0']}},
+            '/api/auth/me': {'ok': 1, '_id': USER_ID, 'username': 'bench'},
+            '/api/game/time': {'ok': 1, 'time': 12345},
+            '/api/game/room-objects': room_objects(),
+            '/api/game/market/orders': market_orders(),
+            '/api/user/memory': {'ok': 1, 'data': self.memory},
+            '/api/user/memory-segment': {'ok': 1, 'data': gz_payload(memory_blob(creeps=300))},
+            '/api/user/console': {'ok': 1, 'result': {'ok': 1, 'n': 1}},
+        }
+        for path, payload in list(self.payloads.items()):
+            self.payloads[path] = json.dumps(payload).encode('utf-8')
+
+    @property
+    def host(self):
+        return '127.0.0.1:%d' % self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,4 +1,17 @@
 from __future__ import absolute_import
+import sys
 from screepsapi.screepsapi import *
 __all__ = ['API', 'Socket']
 
+if sys.version_info >= (3, 7):
+    __all__ += ['AsyncAPI', 'AsyncSocket']
+
+    ## the asyncio clients (and asyncio itself) are only imported when first used
+    def __getattr__(name):
+        if name == 'AsyncAPI':
+            from screepsapi.asyncapi import AsyncAPI
+            return AsyncAPI
+        if name == 'AsyncSocket':
+            from screepsapi.asyncsocket import AsyncSocket
+            return AsyncSocket
+        raise AttributeError("module 'screepsapi' has no attribute %r" % name)
@@ -0,0 +1,102 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from screepsapi.screepsapi import API, DEFAULT_SHARD
+
+DEFAULT_CONCURRENCY = 16
+
+## methods that manage the underlying client rather than hitting an endpoint, passed through as is
+SYNC_ONLY = ('make_session', 'observe', 'notify', 'request_event', 'parse', 'receive', 'submit', 'history_reader', 'crawler',
+             'write_buffer', 'market_book', 'console_client',
+             'backoff_delay', 'hedge_delay')
+
+
+class AsyncAPI(object):
+    ## Every endpoint method of API is available here as a coroutine. Calls run on the
+    ## wrapped API's pooled session (so token rotation in API.req is shared) from a worker
+    ## pool of `concurrency` threads, which bounds the number of requests in flight.
+
+    def __init__(self, *args, concurrency=DEFAULT_CONCURRENCY, api=None, **kwargs):
+        if api is None:
+            kwargs.setdefault('pool_maxsize', concurrency)
+            api = API(*args, **kwargs)
+        self.api = api
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    @property
+    def token(self):
+        return self.api.token
+
+    def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    ## async counterpart of API.bulk, yielding (item, result) pairs as they complete and
+    ## (item, exception) for items that failed
+    async def bulk(self, func, items):
+        pending = dict((self.run(func, item), item) for item in items)
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                yield pending.pop(future), error if error is not None else future.result()
+
+    def room_objects_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.api.room_objects(room, shard=shard), rooms)
+
+    def room_terrain_many(self, rooms, encoded=False, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.api.room_terrain(room, encoded=encoded, shard=shard), rooms)
+
+    def terrain_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.api.terrain(room, shard=shard), rooms)
+
+    def room_status_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.api.room_status(room, shard=shard), rooms)
+
+    def get_segments(self, segments, shard=DEFAULT_SHARD):
+        return self.bulk(lambda segment: self.api.get_segment(segment, shard=shard), segments)
+
+    def history_range(self, room, start, end, shard=DEFAULT_SHARD):
+        interval = self.api.history_interval
+        ticks = range(start - (start % interval), end, interval)
+        return self.bulk(lambda tick: self.api.history(room, tick, shard=shard), ticks)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+        self.api.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def _passthrough(name):
+    @functools.wraps(getattr(API, name))
+    def call(self, *args, **kwargs):
+        return getattr(self.api, name)(*args, **kwargs)
+    return call
+
+
+def _wrap(name):
+    @functools.wraps(getattr(API, name))
+    async def call(self, *args, **kwargs):
+        return await self.run(getattr(self.api, name), *args, **kwargs)
+    return call
+
+
+for _name in dir(API):
+    if _name.startswith('_') or _name in AsyncAPI.__dict__:
+        continue
+    if _name in SYNC_ONLY:
+        setattr(AsyncAPI, _name, _passthrough(_name))
+        continue
+    if not callable(getattr(API, _name)):
+        continue
+    setattr(AsyncAPI, _name, _wrap(_name))
@@ -0,0 +1,165 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import ssl
+
+from screepsapi.codec import decode_message
+from screepsapi.screepsapi import API, DEFAULT_PING_INTERVAL, OFFICIAL_HOST, PTR_PREFIX
+
+## messages larger than this (and all compressed ones) are decoded off the event loop
+INLINE_DECODE_LIMIT = 16 * 1024
+
+DEFAULT_QUEUE_SIZE = 1000
+
+
+class Subscription(object):
+    ## Async iterator over the (channel, data) messages of one watchpoint. Each subscription has
+    ## its own bounded queue; when a slow consumer lets it fill up the oldest message is dropped
+    ## (and counted in `dropped`) so the socket's reader never waits on any one consumer.
+
+    def __init__(self, socket, channel, maxsize=DEFAULT_QUEUE_SIZE):
+        self.socket = socket
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(item)
+            self.dropped += 1
+
+    ## ends the iteration, dropping the oldest pending message if a slow consumer left the queue full
+    def finish(self):
+        self.put(None)
+
+    async def close(self):
+        await self.socket.unsubscribe(self)
+
+
+class AsyncSocket(object):
+    ## asyncio websocket client. Any number of these can share one event loop, one per shard,
+    ## server or account, and each watchpoint is consumed as an async iterator:
+    ##
+    ##     async for channel, data in await socket.subscribe('room:shard0/W1N1'):
+    ##
+    ## Requires the optional 'websockets' package.
+
+    def __init__(self, user=None, password=None, host=None, prefix=None, secure=True, token=None, ptr=False,
+                 ping_interval=DEFAULT_PING_INTERVAL, api=None, executor=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.prefix = PTR_PREFIX if ptr else prefix
+        self.secure = secure
+        self.atoken = token
+        self.api = api
+        self.ping_interval = ping_interval
+        self.queue_size = queue_size
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.user_id = None
+        self.ws = None
+        self.reader = None
+        self.authed = None
+        self.subscriptions = {}
+
+    @property
+    def url(self):
+        url = 'wss://' if self.secure else 'ws://'
+        url += self.host if self.host else OFFICIAL_HOST
+        url += self.prefix if self.prefix else ''
+        return url + '/socket/websocket'
+
+    def authenticate(self):
+        if self.api is None:
+            self.api = API(u=self.user, p=self.password, host=self.host, prefix=self.prefix,
+                           secure=self.secure, token=self.atoken)
+        self.user_id = self.api.me()['_id']
+        return self.api.token
+
+    async def connect(self):
+        import websockets
+        loop = asyncio.get_running_loop()
+        token = await loop.run_in_executor(self.executor, self.authenticate)
+        sslopt = {'ssl': ssl.create_default_context()} if self.secure else {}
+        self.ws = await websockets.connect(self.url, ping_interval=self.ping_interval, max_size=None, **sslopt)
+        self.authed = asyncio.Event()
+        await self.ws.send('gzip on')
+        await self.ws.send('auth ' + token)
+        self.reader = asyncio.ensure_future(self.receive())
+        await self.authed.wait()
+        if self.reader.done():
+            ## the connection dropped or authentication failed before 'auth ok'
+            self.reader.result()
+        return self
+
+    async def receive(self):
+        loop = asyncio.get_running_loop()
+        try:
+            async for message in self.ws:
+                if message.startswith('auth ok'):
+                    self.authed.set()
+                    continue
+                if message.startswith('auth failed'):
+                    raise ValueError('Socket authentication failed')
+                if message.startswith(('time', 'protocol', 'package')):
+                    continue
+                if message.startswith('gz') or len(message) > INLINE_DECODE_LIMIT:
+                    decoded = await loop.run_in_executor(self.executor, decode_message, message)
+                else:
+                    decoded = decode_message(message)
+                if decoded is None:
+                    continue
+                for subscription in self.subscriptions.get(decoded[0], ()):
+                    subscription.put(decoded)
+        finally:
+            self.authed.set()
+            for subscriptions in self.subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.finish()
+
+    async def subscribe(self, watchpoint):
+        subscription = Subscription(self, watchpoint, self.queue_size)
+        if watchpoint not in self.subscriptions:
+            self.subscriptions[watchpoint] = []
+            await self.ws.send('subscribe ' + watchpoint)
+        self.subscriptions[watchpoint].append(subscription)
+        return subscription
+
+    async def subscribe_user(self, watchpoint):
+        return await self.subscribe('user:' + self.user_id + '/' + watchpoint)
+
+    async def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.channel, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if not subscriptions and subscription.channel in self.subscriptions:
+            del self.subscriptions[subscription.channel]
+            await self.ws.send('unsubscribe ' + subscription.channel)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+            self.reader = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
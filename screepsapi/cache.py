@@ -0,0 +1,168 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+FOREVER = float('inf')
+
+## seconds a GET response stays valid, keyed by endpoint path (or path prefix)
+DEFAULT_TTLS = {
+    'auth/query-token': 60,
+    'user/find': 3600,
+    'leaderboard/seasons': 3600,
+    'game/shards/info': 300,
+    'game/world-size': 86400,
+    'version': 300,
+    'game/market/orders-index': 60,
+    'game/room-status': 300,
+    ## chunks for past ticks never change, and chunks still being written are not served yet
+    '../room-history': FOREVER,
+}
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class MemoryBackend(object):
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, body = entry
+        if expires < time.time():
+            self.delete(key)
+            return None
+        ## most recently used entries live at the end
+        del self.entries[key]
+        self.entries[key] = entry
+        return body
+
+    def put(self, key, body, expires):
+        self.delete(key)
+        self.entries[key] = (expires, body)
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes and self.entries:
+            self.delete(next(iter(self.entries)))
+
+    def delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskBackend(object):
+    ## One file per response named after the hashed key, holding the expiry time on the first
+    ## line. File mtimes double as the LRU order, so the cache survives restarts.
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.bytes = sum(os.path.getsize(f) for f in self.files())
+
+    def files(self):
+        return [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.cache')]
+
+    def filename(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        filename = self.filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                expires = float(f.readline())
+                body = f.read()
+        except (IOError, OSError, ValueError):
+            return None
+        if expires < time.time():
+            self.delete(key)
+            return None
+        os.utime(filename, None)
+        return body
+
+    def put(self, key, body, expires):
+        self.delete(key)
+        filename = self.filename(key)
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(repr(expires).encode('ascii') + b'\n')
+            f.write(body)
+        ## another process may have written the same entry meanwhile, os.rename would fail over it on Windows
+        getattr(os, 'replace', os.rename)(filename + '.tmp', filename)
+        self.bytes += os.path.getsize(filename)
+        if self.bytes > self.max_bytes:
+            for oldest in sorted(self.files(), key=os.path.getmtime):
+                if self.bytes <= self.max_bytes:
+                    break
+                self.remove(oldest)
+
+    def delete(self, key):
+        self.remove(self.filename(key))
+
+    def remove(self, filename):
+        try:
+            size = os.path.getsize(filename)
+            os.remove(filename)
+            self.bytes -= size
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.files())
+
+
+class ResponseCache(object):
+    ## Opt-in cache for the raw bodies of read-only GET endpoints. Bodies are parsed again on
+    ## every hit so callers never share (and mutate) the same response object.
+
+    def __init__(self, backend=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.backend = backend if backend is not None else MemoryBackend(max_bytes)
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    ## seconds path may be cached for, or None if it should not be cached at all
+    def ttl(self, path):
+        if path in self.ttls:
+            return self.ttls[path]
+        for prefix, ttl in self.ttls.items():
+            if path.startswith(prefix + '/'):
+                return ttl
+        return None
+
+    def key(self, url, params):
+        return url + '?' + json.dumps(params, sort_keys=True)
+
+    def get(self, key):
+        with self.lock:
+            body = self.backend.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return body
+
+    def put(self, key, body, ttl):
+        with self.lock:
+            self.backend.put(key, body, time.time() + ttl)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self.backend), 'bytes': self.backend.bytes}
@@ -0,0 +1,163 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from binascii import a2b_base64
+import importlib
+import json
+import re
+import zlib
+
+GZIP_PREFIX = 'gz:'
+
+## JSON parsers tried in order, the fast ones are optional dependencies
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+
+## base64 characters decoded per step, must be a multiple of 4
+CHUNK_SIZE = 64 * 1024
+
+backend = None
+_loads = None
+
+WHITESPACE = re.compile(br'[ \t\n\r]*')
+STRING = re.compile(br'"(?:[^"\\]|\\.)*"', re.DOTALL)
+SCALAR = re.compile(br'[^,\]}\s]+')
+STRUCTURE = re.compile(br'["\[\]{}]')
+
+
+## selects the JSON parser, by default the first of JSON_BACKENDS that is installed
+def use_backend(name=None):
+    global backend, _loads
+    for candidate in (JSON_BACKENDS if name is None else (name,)):
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        backend, _loads = candidate, module.loads
+        return backend
+
+
+## parses JSON straight from bytes, bytearray or str into plain dicts and lists
+def loads(data):
+    if _loads is None:
+        use_backend()
+    return _loads(data)
+
+
+## channel name of a socket message without parsing it, messages look like ["<channel>", <data>]
+def channel_of(message):
+    if message.startswith('["'):
+        end = message.find('"', 2)
+        if end > 0:
+            return message[2:end]
+    return None
+
+
+## text of a compressed 'gz:' socket message
+def inflate_message(message):
+    return zlib.decompress(a2b_base64(message[3:]), 0).decode('utf-8')
+
+
+## decompresses and parses a socket message into its (channel, data) pair, None for non-JSON messages
+def decode_message(message):
+    if message.startswith('gz'):
+        message = zlib.decompress(a2b_base64(message[3:]), 0)
+    try:
+        return tuple(loads(message))
+    except ValueError:
+        return None
+
+
+## decodes a 'gz:' prefixed base64 gzip payload, feeding the decompressor chunk by chunk
+## instead of materialising the whole decoded buffer first
+def gunzip_b64(data):
+    if data.startswith(GZIP_PREFIX):
+        data = data[len(GZIP_PREFIX):]
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    out = bytearray()
+    for offset in range(0, len(data), CHUNK_SIZE):
+        out += decompressor.decompress(a2b_base64(data[offset:offset + CHUNK_SIZE]))
+    out += decompressor.flush()
+    return out
+
+
+def skip_whitespace(buf, pos):
+    return WHITESPACE.match(buf, pos).end()
+
+
+## index just past the JSON value starting at pos, without building any objects
+def skip_value(buf, pos):
+    pos = skip_whitespace(buf, pos)
+    char = buf[pos:pos + 1]
+    if char == b'"':
+        return STRING.match(buf, pos).end()
+    if char not in (b'{', b'['):
+        return SCALAR.match(buf, pos).end()
+    depth = 0
+    while True:
+        match = STRUCTURE.search(buf, pos)
+        if match is None:
+            raise ValueError('Unterminated JSON value')
+        token = match.group()
+        if token == b'"':
+            pos = STRING.match(buf, match.start()).end()
+            continue
+        pos = match.end()
+        depth += 1 if token in (b'{', b'[') else -1
+        if depth == 0:
+            return pos
+
+
+## position of the member `key` of the object or array starting at pos, or None
+def find_member(buf, pos, key):
+    pos = skip_whitespace(buf, pos)
+    opening = buf[pos:pos + 1]
+    if opening == b'[':
+        if not isinstance(key, int) and not key.isdigit():
+            return None
+        index = int(key)
+        pos = skip_whitespace(buf, pos + 1)
+        for _ in range(index):
+            if buf[pos:pos + 1] == b']':
+                return None
+            pos = skip_whitespace(buf, skip_value(buf, pos))
+            if buf[pos:pos + 1] == b',':
+                pos = skip_whitespace(buf, pos + 1)
+        return None if buf[pos:pos + 1] == b']' else pos
+    if opening != b'{':
+        return None
+    key = str(key)
+    pos = skip_whitespace(buf, pos + 1)
+    while buf[pos:pos + 1] == b'"':
+        end = STRING.match(buf, pos).end()
+        name = json.loads(buf[pos:end].decode('utf-8'))
+        pos = skip_whitespace(buf, end)
+        pos = skip_whitespace(buf, pos + 1)
+        if name == key:
+            return pos
+        pos = skip_whitespace(buf, skip_value(buf, pos))
+        if buf[pos:pos + 1] == b',':
+            pos = skip_whitespace(buf, pos + 1)
+    return None
+
+
+## parses only the value at a dotted path ('creeps.Harvester1.memory') or key list of a JSON buffer
+def extract(buf, path):
+    keys = path.split('.') if isinstance(path, str) else path
+    pos = 0
+    for key in keys:
+        pos = find_member(buf, pos, key)
+        if pos is None:
+            return None
+    return loads(bytes(buf[pos:skip_value(buf, pos)]))
+
+
+## decodes a memory or segment payload: parsed JSON, raw JSON bytes or just one subpath
+def decode_payload(data, raw=False, select=None):
+    buf = gunzip_b64(data)
+    if raw:
+        return bytes(buf)
+    if select is not None:
+        return extract(buf, select)
+    return loads(buf)
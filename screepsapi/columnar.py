@@ -0,0 +1,98 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+## Column specs are (column, dotted path into the row, numpy dtype, value used when missing)
+
+ROOM_OBJECT_FIELDS = (
+    ('id', '_id', 'U24', ''),
+    ('type', 'type', 'U24', ''),
+    ('x', 'x', 'i1', -1),
+    ('y', 'y', 'i1', -1),
+    ('hits', 'hits', 'i8', -1),
+    ('hitsMax', 'hitsMax', 'i8', -1),
+    ('user', 'user', 'U24', ''),
+    ('energy', 'store.energy', 'i8', 0),
+    ('level', 'level', 'i1', -1),
+)
+
+MARKET_ORDER_FIELDS = (
+    ('id', '_id', 'U24', ''),
+    ('type', 'type', 'U4', ''),
+    ('resourceType', 'resourceType', 'U32', ''),
+    ('price', 'price', 'f8', float('nan')),
+    ('amount', 'amount', 'i8', 0),
+    ('remainingAmount', 'remainingAmount', 'i8', 0),
+    ('roomName', 'roomName', 'U10', ''),
+    ('created', 'created', 'i8', 0),
+)
+
+MAP_STATS_FIELDS = (
+    ('status', 'status', 'U16', ''),
+    ('novice', 'novice', 'i8', 0),
+    ('respawnArea', 'respawnArea', 'i8', 0),
+    ('openTime', 'openTime', 'i8', 0),
+    ('owner', 'own.user', 'U24', ''),
+    ('level', 'own.level', 'i1', 0),
+    ('safeMode', 'safeMode', '?', False),
+)
+
+
+def getter(path, default):
+    keys = path.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+        def get(row):
+            value = row.get(key)
+            return default if value is None else value
+        return get
+
+    def get(row):
+        for key in keys:
+            if not isinstance(row, dict):
+                return default
+            row = row.get(key)
+        return default if row is None else row
+    return get
+
+
+## dict of column lists built from an iterable of dicts in one pass
+def columns(rows, fields):
+    names = [field[0] for field in fields]
+    getters = [getter(field[1], field[3]) for field in fields]
+    cols = [[] for _ in fields]
+    for row in rows:
+        for col, get in zip(cols, getters):
+            col.append(get(row))
+    return dict(zip(names, cols))
+
+
+## numpy structured array with one record per row, requires numpy
+def to_numpy(cols, fields):
+    import numpy
+    dtype = numpy.dtype([(name, kind) for name, _, kind, _ in fields if name in cols])
+    length = len(next(iter(cols.values()))) if cols else 0
+    array = numpy.empty(length, dtype=dtype)
+    for name in dtype.names:
+        array[name] = cols[name]
+    return array
+
+
+def build(rows, fields, numpy=False):
+    cols = columns(rows, fields)
+    return to_numpy(cols, fields) if numpy else cols
+
+
+def room_objects_columns(ret, fields=ROOM_OBJECT_FIELDS, numpy=False):
+    return build(ret.get('objects') or (), fields, numpy)
+
+
+def market_orders_columns(ret, fields=MARKET_ORDER_FIELDS, numpy=False):
+    return build(ret.get('list') or (), fields, numpy)
+
+
+def map_stats_columns(ret, fields=MAP_STATS_FIELDS, numpy=False):
+    stats = ret.get('stats') or {}
+    fields = (('room', None, 'U10', ''),) + tuple(fields)
+    cols = columns(stats.values(), fields[1:])
+    cols['room'] = list(stats.keys())
+    return to_numpy(cols, fields) if numpy else cols
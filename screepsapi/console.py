@@ -0,0 +1,167 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from concurrent.futures import Future, TimeoutError
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from screepsapi.codec import loads
+from screepsapi.screepsapi import DEFAULT_SHARD
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_WINDOW = 0.05
+DEFAULT_TIMEOUT = 30
+
+MARKER = '[screepsapi:'
+
+## Evaluates every [id, expression] pair on its own so one failing expression does not take the
+## batch down, and prints the outcomes as a single result line tagged with the batch id.
+## Values that do not survive JSON (circular game objects) come back as their string form.
+## (0,eval) is an indirect eval, so expressions run in global scope like a plain console command
+## and cannot see or overwrite the wrapper's own variables.
+BATCH_TEMPLATE = (
+    '(function(__sa_b){var __sa_r={};__sa_b.forEach(function(__sa_e){try{var __sa_v=(0,eval)(__sa_e[1]);'
+    'try{__sa_r[__sa_e[0]]={v:__sa_v===undefined?null:JSON.parse(JSON.stringify(__sa_v))}}'
+    'catch(__sa_x){__sa_r[__sa_e[0]]={s:String(__sa_v)}}}'
+    'catch(__sa_x){__sa_r[__sa_e[0]]={e:String(__sa_x&&__sa_x.stack||__sa_x)}}});'
+    'return %s+JSON.stringify(__sa_r)})(%s)'
+)
+
+
+class ConsoleError(Exception):
+    pass
+
+
+class ConsoleClient(object):
+    ## Runs console expressions and hands back each one's result as a Future. Expressions queued
+    ## for the same shard within `window` seconds are sent as one wrapped expression of at most
+    ## `batch_size` items, so many queries cost one user/console call. Results are matched to
+    ## their expressions from the console channel of `socket`, which must be running.
+
+    def __init__(self, api, socket, batch_size=DEFAULT_BATCH_SIZE, window=DEFAULT_WINDOW,
+                 timeout=DEFAULT_TIMEOUT):
+        self.api = api
+        self.socket = socket
+        self.batch_size = batch_size
+        self.window = window
+        self.timeout = timeout
+        self.prefix = uuid.uuid4().hex[:8]
+        self.ids = itertools.count()
+        self.queues = {}
+        self.batches = {}
+        self.cond = threading.Condition()
+        self.closed = False
+
+        socket.on('user:*/console', self.on_console)
+        user_id = socket.user_id or api.me()['_id']
+        socket.subscribe('user:%s/console' % user_id)
+
+        self.thread = threading.Thread(target=self.work)
+        self.thread.daemon = True
+        self.thread.start()
+
+    ## queues an expression, the Future resolves to its value or raises ConsoleError or TimeoutError
+    def submit(self, expression, shard=DEFAULT_SHARD, timeout=None, batch=True):
+        future = Future()
+        deadline = time.time() + (timeout if timeout is not None else self.timeout)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('ConsoleClient is closed')
+            queue = self.queues.setdefault(shard, [])
+            ## expressions that must not share a tick with others go out alone
+            if not batch:
+                self.send(shard, [(expression, future, deadline)])
+                ## wake the worker so it keeps track of this expression's deadline
+                self.cond.notify()
+                return future
+            queue.append((expression, future, deadline, time.time()))
+            if len(queue) == 1 or len(queue) >= self.batch_size:
+                self.cond.notify()
+        return future
+
+    def run(self, expression, shard=DEFAULT_SHARD, timeout=None):
+        timeout = timeout if timeout is not None else self.timeout
+        return self.submit(expression, shard, timeout).result(timeout)
+
+    ## results of many expressions in order, sent in as few batches as possible
+    def map(self, expressions, shard=DEFAULT_SHARD, timeout=None):
+        futures = [self.submit(expression, shard, timeout) for expression in expressions]
+        return [future.result() for future in futures]
+
+    def wrap(self, batch_id, items):
+        pairs = [['%s' % index, expression] for index, (expression, _, _) in enumerate(items)]
+        return BATCH_TEMPLATE % (json.dumps(MARKER + batch_id + ']'), json.dumps(pairs))
+
+    ## posts one batch, called with the lock held
+    def send(self, shard, items):
+        batch_id = '%s-%d' % (self.prefix, next(self.ids))
+        self.batches[batch_id] = items
+        threading.Thread(target=self.post, args=(batch_id, shard, self.wrap(batch_id, items))).start()
+
+    def post(self, batch_id, shard, expression):
+        try:
+            self.api.console(expression, shard=shard)
+        except Exception as e:
+            with self.cond:
+                for _, future, _ in self.batches.pop(batch_id, ()):
+                    if not future.done():
+                        future.set_exception(e)
+
+    def on_console(self, ws, channel, data):
+        for line in (data.get('messages') or {}).get('results') or ():
+            if not line.startswith(MARKER):
+                continue
+            batch_id, _, body = line[len(MARKER):].partition(']')
+            try:
+                results = loads(body)
+            except ValueError as e:
+                results = {'error': 'unreadable batch result: %s' % e}
+            with self.cond:
+                for index, (_, future, _) in enumerate(self.batches.pop(batch_id, ())):
+                    outcome = results.get('%s' % index) or {'e': results.get('error', 'missing from batch result')}
+                    if future.done():
+                        continue
+                    if 'e' in outcome:
+                        future.set_exception(ConsoleError(outcome['e']))
+                    else:
+                        future.set_result(outcome['v'] if 'v' in outcome else outcome.get('s'))
+
+    ## flushes queues whose oldest expression waited a full window or that filled a batch,
+    ## and fails expressions that ran out of time
+    def work(self):
+        with self.cond:
+            while not self.closed:
+                now = time.time()
+                wait = None
+                for shard, queue in self.queues.items():
+                    while queue and (len(queue) >= self.batch_size or now - queue[0][3] >= self.window):
+                        items = [entry[:3] for entry in queue[:self.batch_size]]
+                        del queue[:self.batch_size]
+                        self.send(shard, items)
+                    if queue:
+                        due = queue[0][3] + self.window - now
+                        wait = due if wait is None else min(wait, due)
+                for batch_id, items in list(self.batches.items()):
+                    for expression, future, deadline in items:
+                        if deadline <= now and not future.done():
+                            future.set_exception(TimeoutError('No console result for %s' % expression))
+                    if all(future.done() for _, future, _ in items):
+                        del self.batches[batch_id]
+                    else:
+                        deadline = min(d for _, f, d in items if not f.done()) - now
+                        wait = deadline if wait is None else min(wait, deadline)
+                self.cond.wait(max(wait, 0.001) if wait is not None else None)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+            for items in self.batches.values():
+                for _, future, _ in items:
+                    if not future.done():
+                        future.cancel()
+            self.batches = {}
+        self.socket.off('user:*/console', self.on_console)
@@ -0,0 +1,182 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import json
+import os
+import time
+
+from requests import HTTPError
+
+from screepsapi.screepsapi import DEFAULT_SHARD
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_STAT_NAME = 'owner0'
+
+## map-stats fields that decide whether a room has to be fetched again
+FINGERPRINT_FIELDS = ('status', 'novice', 'respawnArea')
+
+
+## room names of a world of the size returned by API.worldsize, row by row from the north west
+def world_rooms(width, height):
+    def name(coord, negative, positive):
+        return '%s%d' % (negative, -coord - 1) if coord < 0 else '%s%d' % (positive, coord)
+    return [name(x, 'W', 'E') + name(y, 'N', 'S')
+            for y in range(-(height // 2), height - height // 2)
+            for x in range(-(width // 2), width - width // 2)]
+
+
+def fingerprint(stats):
+    own = stats.get('own') or {}
+    return [stats.get(field) for field in FINGERPRINT_FIELDS] + [own.get('user'), own.get('level')]
+
+
+class JsonlWriter(object):
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    ## Room records as Parquet row groups, nested values are stored as JSON strings. A file that
+    ## already exists is left alone and the records go to the next free 'name.N.parquet'.
+
+    COLUMNS = ('room', 'shard', 'time', 'status', 'owner', 'level', 'stats', 'objects', 'users', 'terrain')
+
+    def __init__(self, path, row_group_size=256):
+        import pyarrow
+        import pyarrow.parquet
+        base, ext = os.path.splitext(path)
+        part = 0
+        while os.path.exists(path):
+            part += 1
+            path = '%s.%d%s' % (base, part, ext)
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.int64() if name in ('time', 'level') else pyarrow.string())
+                                      for name in self.COLUMNS])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.rows = []
+
+    def write(self, record):
+        self.rows.append(dict((name, record.get(name) if name in ('room', 'shard', 'time', 'status', 'owner', 'level', 'terrain')
+                               else json.dumps(record.get(name))) for name in self.COLUMNS))
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(self.pyarrow.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class WorldCrawler(object):
+    ## Incremental crawl of every room of a shard. Rooms come from worldsize and are checked
+    ## with map_stats in batches; only rooms whose status, owner or level changed since the last
+    ## crawl have their objects fetched (on the client's bulk pool). Progress is checkpointed to
+    ## a JSON file after every batch so an interrupted crawl resumes where it stopped.
+
+    def __init__(self, api, shard=DEFAULT_SHARD, checkpoint=None, output=None, batch_size=DEFAULT_BATCH_SIZE,
+                 stat_name=DEFAULT_STAT_NAME, objects=True, terrain=False):
+        self.api = api
+        self.shard = shard
+        self.checkpoint = checkpoint
+        self.output = output
+        self.batch_size = batch_size
+        self.stat_name = stat_name
+        self.objects = objects
+        self.terrain = terrain
+        self.state = {'cursor': 0, 'fingerprints': {}}
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self.state = json.load(f)
+
+    def save(self):
+        if self.checkpoint is None:
+            return
+        with open(self.checkpoint + '.tmp', 'w') as f:
+            json.dump(self.state, f)
+        ## os.rename fails on Windows once a checkpoint exists, os.replace overwrites it
+        getattr(os, 'replace', os.rename)(self.checkpoint + '.tmp', self.checkpoint)
+
+    def writer(self):
+        if self.output is None:
+            return None
+        if self.output.endswith('.parquet'):
+            return ParquetWriter(self.output)
+        return JsonlWriter(self.output)
+
+    def rooms(self):
+        size = self.api.worldsize(shard=self.shard)
+        return world_rooms(size['width'], size['height'])
+
+    def map_stats(self, rooms):
+        while True:
+            try:
+                return self.api.map_stats(rooms, self.stat_name, shard=self.shard)
+            except HTTPError:
+                ## the server caps rooms per call, retry with smaller batches
+                if self.batch_size <= 1 or len(rooms) <= 1:
+                    raise
+                self.batch_size = max(len(rooms) // 2, 1)
+                rooms = rooms[:self.batch_size]
+
+    def record(self, room, stats, users):
+        own = stats.get('own') or {}
+        record = {'room': room, 'shard': self.shard, 'time': int(time.time()), 'status': stats.get('status'),
+                  'owner': (users.get(own['user']) or {}).get('username', own['user']) if own.get('user') else None,
+                  'level': own.get('level'), 'stats': stats}
+        if self.objects and stats.get('status') != 'out of borders':
+            objects = self.api.room_objects(room, shard=self.shard)
+            record['objects'] = objects.get('objects')
+            record['users'] = objects.get('users')
+        if self.terrain and room not in self.state['fingerprints']:
+            record['terrain'] = self.api.terrain(room, shard=self.shard).encoded()
+        return record
+
+    ## crawls until every room has been checked once, yielding the records of changed rooms
+    def __iter__(self):
+        rooms = self.rooms()
+        fingerprints = self.state['fingerprints']
+        writer = self.writer()
+        try:
+            while self.state['cursor'] < len(rooms):
+                cursor = self.state['cursor']
+                batch = rooms[cursor:cursor + self.batch_size]
+                ret = self.map_stats(batch)
+                batch = batch[:self.batch_size]
+                stats, users = ret.get('stats') or {}, ret.get('users') or {}
+                changed = [room for room in batch
+                           if room in stats and fingerprints.get(room) != fingerprint(stats[room])]
+                failed = None
+                for room, record in self.api.bulk(lambda room: self.record(room, stats[room], users), changed):
+                    if isinstance(record, Exception):
+                        failed = failed or record
+                        continue
+                    if writer is not None:
+                        writer.write(record)
+                    fingerprints[room] = fingerprint(stats[room])
+                    yield record
+                ## the rest of the batch is kept, the cursor stays put so a resumed crawl retries the failed rooms
+                if failed is not None:
+                    raise failed
+                self.state['cursor'] = cursor + len(batch)
+                self.save()
+            self.state['cursor'] = 0
+            self.save()
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def run(self):
+        return sum(1 for _ in self)
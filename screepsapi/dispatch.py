@@ -0,0 +1,232 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from collections import deque
+import re
+import threading
+import time
+
+from screepsapi.codec import loads
+
+## overflow policies for a full MessageQueue
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+
+## channels whose messages are diffs against the previous one, coalescing merges them
+DIFF_CHANNELS = ('room:',)
+
+## channels where every message matters, never coalesced
+STREAM_CHANNELS = ('console', 'newMessage')
+
+
+## applies a room diff onto an earlier one in place: nested objects merge, None deletes
+def merge_diff(base, diff):
+    for key, value in diff.items():
+        current = base.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merge_diff(current, value)
+        else:
+            base[key] = value
+    return base
+
+
+class Entry(object):
+    __slots__ = ('channel', 'message', 'data', 'context', 'enqueued')
+
+    def __init__(self, channel, message, context=None):
+        self.channel = channel
+        self.message = message
+        self.data = None
+        self.context = context
+        self.enqueued = time.time()
+
+
+class ChannelStats(object):
+    __slots__ = ('received', 'handled', 'dropped', 'coalesced', 'lag', 'max_lag', 'total_lag')
+
+    def __init__(self):
+        self.received = 0
+        self.handled = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class MessageQueue(object):
+    ## Bounded queue between the socket's receive thread and handler workers. Messages of one
+    ## channel are handed out in order and never to two workers at once. When full, BLOCK stalls
+    ## the receiver, DROP_OLDEST discards the oldest pending message and COALESCE folds a new
+    ## message into the pending one of its channel (merging room diffs, replacing other state).
+
+    def __init__(self, maxsize=1000, policy=BLOCK):
+        if policy not in (BLOCK, DROP_OLDEST, COALESCE):
+            raise ValueError('Unknown overflow policy %r' % policy)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.entries = deque()
+        self.pending = {}
+        self.busy = set()
+        self.closed = False
+        self.channels = {}
+        self.cond = threading.Condition()
+
+    def stats(self, channel=None):
+        with self.cond:
+            if channel is not None:
+                return self.channels[channel].as_dict() if channel in self.channels else None
+            return dict((name, stats.as_dict()) for name, stats in self.channels.items())
+
+    def coalescible(self, channel):
+        return channel is not None and not channel.endswith(STREAM_CHANNELS)
+
+    def coalesce(self, entry, message):
+        if entry.channel.startswith(DIFF_CHANNELS):
+            if entry.data is None:
+                entry.data = loads(entry.message)
+            merge_diff(entry.data[1], loads(message)[1])
+        else:
+            entry.message = message
+            entry.data = None
+
+    def put(self, channel, message, context=None):
+        with self.cond:
+            stats = self.channels.get(channel)
+            if stats is None:
+                stats = self.channels[channel] = ChannelStats()
+            stats.received += 1
+            if self.policy == COALESCE and channel in self.pending:
+                self.coalesce(self.pending[channel], message)
+                stats.coalesced += 1
+                return
+            while len(self.entries) >= self.maxsize and not self.closed:
+                if self.policy == DROP_OLDEST:
+                    dropped = self.entries.popleft()
+                    if self.pending.get(dropped.channel) is dropped:
+                        del self.pending[dropped.channel]
+                    self.channels[dropped.channel].dropped += 1
+                else:
+                    self.cond.wait()
+            entry = Entry(channel, message, context)
+            self.entries.append(entry)
+            if self.policy == COALESCE and self.coalescible(channel):
+                self.pending[channel] = entry
+            self.cond.notify_all()
+
+    ## next entry whose channel is not being handled, None once closed
+    def get(self):
+        with self.cond:
+            while True:
+                if self.closed:
+                    return None
+                for index, entry in enumerate(self.entries):
+                    if entry.channel is None or entry.channel not in self.busy:
+                        del self.entries[index]
+                        if self.pending.get(entry.channel) is entry:
+                            del self.pending[entry.channel]
+                        if entry.channel is not None:
+                            self.busy.add(entry.channel)
+                        stats = self.channels[entry.channel]
+                        stats.lag = time.time() - entry.enqueued
+                        stats.max_lag = max(stats.max_lag, stats.lag)
+                        stats.total_lag += stats.lag
+                        self.cond.notify_all()
+                        return entry
+                self.cond.wait()
+
+    def done(self, entry):
+        with self.cond:
+            self.busy.discard(entry.channel)
+            self.channels[entry.channel].handled += 1
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Node(object):
+    __slots__ = ('children', 'handlers')
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = []
+
+
+class ChannelIndex(object):
+    ## Maps channel patterns to handlers. Plain channels live in a dict; patterns are split into
+    ## ':' and '/' separated segments and stored in a trie where '*' matches one segment and
+    ## '**' everything that follows. Lookups are memoised per channel until handlers change.
+
+    SEGMENT = re.compile(r'[^:/]+|[:/]')
+
+    def __init__(self):
+        self.exact = {}
+        self.root = Node()
+        self.patterns = 0
+        self.memo = {}
+
+    def __len__(self):
+        return sum(len(h) for h in self.exact.values()) + self.patterns
+
+    def add(self, pattern, handler):
+        if '*' in pattern:
+            node = self.root
+            for segment in self.SEGMENT.findall(pattern):
+                node = node.children.setdefault(segment, Node())
+            node.handlers.append(handler)
+            self.patterns += 1
+        else:
+            self.exact.setdefault(pattern, []).append(handler)
+        self.memo.clear()
+
+    ## removes one handler from a pattern, or every handler of the pattern
+    def remove(self, pattern, handler=None):
+        if '*' in pattern:
+            node = self.root
+            for segment in self.SEGMENT.findall(pattern):
+                node = node.children.get(segment)
+                if node is None:
+                    return
+            handlers = node.handlers
+        else:
+            handlers = self.exact.get(pattern, [])
+        removed = [h for h in handlers if handler is None or h == handler]
+        for h in removed:
+            handlers.remove(h)
+        if '*' in pattern:
+            self.patterns -= len(removed)
+        elif not handlers:
+            self.exact.pop(pattern, None)
+        self.memo.clear()
+
+    def match(self, channel):
+        handlers = self.memo.get(channel)
+        if handlers is None:
+            handlers = list(self.exact.get(channel, ()))
+            if self.patterns:
+                self.walk(self.root, self.SEGMENT.findall(channel), 0, handlers)
+            self.memo[channel] = handlers
+        return handlers
+
+    def walk(self, node, segments, index, found):
+        if '**' in node.children:
+            found.extend(node.children['**'].handlers)
+        if index == len(segments):
+            found.extend(node.handlers)
+            return
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            self.walk(child, segments, index + 1, found)
+        if segment not in (':', '/') and '*' in node.children:
+            self.walk(node.children['*'], segments, index + 1, found)
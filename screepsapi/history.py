@@ -0,0 +1,84 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from collections import deque
+import json
+
+from requests import HTTPError
+
+from screepsapi.cache import DiskBackend, FOREVER
+from screepsapi.codec import loads
+from screepsapi.roomstate import RoomState
+from screepsapi.screepsapi import DEFAULT_SHARD
+
+DEFAULT_PREFETCH = 2
+
+
+class HistoryReader(object):
+    ## Replays a room tick by tick from its history chunks. Iterating yields (tick, RoomState)
+    ## for every tick in [start, end); the same RoomState is updated in place from tick to tick,
+    ## so take a snapshot() of anything that has to outlive the next step. The next `prefetch`
+    ## chunks are downloaded in the background on the client's bulk pool, and with a cache
+    ## (a directory or cache backend) downloaded chunks are kept, as past history never changes.
+
+    def __init__(self, api, room, start, end, shard=DEFAULT_SHARD, prefetch=DEFAULT_PREFETCH, cache=None,
+                 skip_missing=True):
+        self.api = api
+        self.room = room
+        self.shard = shard
+        self.start = start
+        self.end = end
+        self.prefetch = max(prefetch, 1)
+        self.cache = DiskBackend(cache) if isinstance(cache, str) else cache
+        self.skip_missing = skip_missing
+        self.state = RoomState(room, shard)
+
+    def chunk_ticks(self):
+        interval = self.api.history_interval
+        return range(self.start - (self.start % interval), self.end, interval)
+
+    def fetch(self, tick):
+        key = 'history:%s:%s:%s:%s' % (self.api.cache_host, self.shard, self.room, tick)
+        if self.cache is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                return loads(body)
+        try:
+            chunk = self.api.history(self.room, tick, shard=self.shard)
+        except HTTPError as e:
+            if self.skip_missing and e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        if self.cache is not None and chunk:
+            self.cache.put(key, json.dumps(chunk).encode('utf-8'), FOREVER)
+        return chunk
+
+    def chunks(self):
+        ticks = iter(self.chunk_ticks())
+        pending = deque()
+        for tick in ticks:
+            pending.append((tick, self.api.submit(self.fetch, tick)))
+            if len(pending) >= self.prefetch:
+                break
+        while pending:
+            tick, future = pending.popleft()
+            for following in ticks:
+                pending.append((following, self.api.submit(self.fetch, following)))
+                break
+            yield tick, future.result()
+
+    def __iter__(self):
+        interval = self.api.history_interval
+        for base, chunk in self.chunks():
+            if not chunk or not chunk.get('ticks'):
+                continue
+            ticks = chunk['ticks']
+            self.state.reset()
+            for tick in range(base, base + interval):
+                objects = ticks.get(str(tick))
+                if objects is not None:
+                    self.state.apply({'objects': objects, 'gameTime': tick})
+                else:
+                    self.state.game_time = tick
+                if self.start <= tick < self.end:
+                    yield tick, self.state
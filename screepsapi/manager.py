@@ -0,0 +1,264 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import atexit
+from itertools import count
+import json
+import os
+import threading
+import time
+
+from screepsapi.ratelimit import DEFAULT_RESERVE, RateLimiter
+from screepsapi.screepsapi import API, DEFAULT_CONCURRENCY, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+
+## where SS3 says to look for the unified credentials file, in order
+CONFIG_PATHS = (
+    '.screeps.yaml',
+    '.screeps.yml',
+    os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.join('~', '.config'), 'screeps', 'config.yaml'),
+    os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.join('~', '.config'), 'screeps', 'config.yml'),
+    os.path.join('~', '.screeps.yaml'),
+    os.path.join('~', '.screeps.yml'),
+)
+
+## token rotations are saved at most this often, in seconds
+DEFAULT_SAVE_INTERVAL = 30
+
+
+## path of the SS3 credentials file, or None when there is none
+def find_config():
+    if os.environ.get('SCREEPS_CONFIG'):
+        return os.environ['SCREEPS_CONFIG']
+    for path in CONFIG_PATHS:
+        path = os.path.expanduser(path)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+## reads the servers of an SS3 credentials file as API keyword arguments per server name
+def load_config(path=None):
+    import yaml
+    path = path or find_config()
+    if path is None:
+        raise IOError('No SS3 credentials file found')
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    servers = {}
+    for name, server in (config.get('servers') or {}).items():
+        host = server.get('host')
+        if host and server.get('port'):
+            host = '%s:%s' % (host, server['port'])
+        account = {
+            'host': host,
+            'secure': server.get('secure', False),
+            'prefix': server.get('path') if server.get('path') not in (None, '', '/') else None,
+            'token': server.get('token'),
+            'u': server.get('username'),
+            'p': server.get('password'),
+        }
+        ## screeps.com entries may leave out secure, it is always https
+        if host in (None, 'screeps.com') and 'secure' not in server:
+            account['secure'] = True
+        if host == 'screeps.com':
+            account['host'] = None
+        servers[name] = account
+    return servers
+
+
+class TokenStore(object):
+    ## Small JSON file of session tokens keyed by user and server. Clients write the token
+    ## back every time the server rotates it, so a restart can pick up where it left off
+    ## instead of signing in again. The file is written at most once every `interval`
+    ## seconds, and on flush(), close() and at exit.
+
+    def __init__(self, path, interval=DEFAULT_SAVE_INTERVAL):
+        self.path = os.path.expanduser(path)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.dirty = False
+        self.saved = 0
+        self.timer = None
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.tokens = json.load(f)
+        atexit.register(self.close)
+
+    def get(self, key):
+        with self.lock:
+            return self.tokens.get(key)
+
+    def set(self, key, token):
+        with self.lock:
+            if self.tokens.get(key) == token:
+                return
+            self.tokens[key] = token
+            self.changed()
+
+    def remove(self, key):
+        with self.lock:
+            if self.tokens.pop(key, None) is not None:
+                self.changed()
+
+    ## saves now if the last save is old enough, otherwise once the interval is up
+    def changed(self):
+        self.dirty = True
+        wait = self.saved + self.interval - time.time()
+        if wait <= 0:
+            self.save()
+        elif self.timer is None:
+            self.timer = threading.Timer(wait, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.dirty:
+                self.save()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def save(self):
+        temp = self.path + '.tmp'
+        ## tokens are credentials, keep the file readable by its owner only
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.tokens, f)
+        ## rename over the old file so a crash mid-write never leaves it truncated
+        getattr(os, 'replace', os.rename)(temp, self.path)
+        self.dirty = False
+        self.saved = time.time()
+
+
+class ClientManager(object):
+    ## Many accounts across many servers. Accounts on the same host share one pooled
+    ## session and one bulk pool of `concurrency` threads, so the cap on requests in flight
+    ## holds per host however many accounts use it. Each account has its own RateLimiter
+    ## (screeps limits are per user) and password sign-ins go through a TokenStore.
+    ## Clients are created on first use.
+
+    def __init__(self, config=None, token_store=None, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        if isinstance(token_store, str):
+            token_store = TokenStore(token_store)
+        self.token_store = token_store
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.concurrency = concurrency
+        self.kwargs = kwargs
+        self.accounts = {}
+        self.clients = {}
+        self.sessions = {}
+        self.executors = {}
+        self.turn = count()
+        self.lock = threading.RLock()
+        if config is not None:
+            self.load(None if config is True else config)
+
+    ## adds every server of an SS3 credentials file, None searches the usual places
+    def load(self, path=None):
+        for name, account in load_config(path).items():
+            self.add(name, **account)
+
+    ## reserve is the share of each rate limit window this account holds back for urgent calls
+    def add(self, name, host=None, secure=True, prefix=None, token=None, u=None, p=None,
+            reserve=DEFAULT_RESERVE, group=None, **kwargs):
+        with self.lock:
+            self.accounts[name] = dict(
+                host=host, secure=secure, prefix=prefix, token=token, u=u, p=p,
+                reserve=reserve, group=group, kwargs=kwargs)
+            old = self.clients.pop(name, None)
+        if old is not None:
+            old.close()
+
+    def session(self, host, secure):
+        key = (secure, host)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.sessions[key] = API.make_session(
+                    pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+            return session
+
+    def executor(self, host, secure):
+        key = (secure, host)
+        with self.lock:
+            executor = self.executors.get(key)
+            if executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                executor = self.executors[key] = ThreadPoolExecutor(max_workers=self.concurrency)
+            return executor
+
+    def client(self, name):
+        with self.lock:
+            api = self.clients.get(name)
+            if api is not None:
+                return api
+            account = self.accounts[name]
+            kwargs = dict(self.kwargs)
+            kwargs.update(account['kwargs'])
+            api = API(
+                u=account['u'], p=account['p'], token=account['token'], host=account['host'],
+                prefix=account['prefix'], secure=account['secure'],
+                session=self.session(account['host'], account['secure']),
+                concurrency=self.concurrency, executor=self.executor(account['host'], account['secure']),
+                rate_limit=RateLimiter(reserve=account['reserve']), token_store=self.token_store,
+                **kwargs)
+            self.clients[name] = api
+            return api
+
+    __getitem__ = client
+
+    def names(self, group=None):
+        return sorted(name for name, account in self.accounts.items() if group is None or account['group'] == group)
+
+    ## The account with the most rate limit headroom left for an endpoint, out of `accounts` (a
+    ## list of names) or `group`. Accounts that have not hit the endpoint yet count as unlimited
+    ## and ties go round robin, so calls spread across accounts until their limits are learned.
+    def route(self, path, method='GET', accounts=None, group=None):
+        names = list(accounts) if accounts is not None else self.names(group)
+        if not names:
+            raise KeyError('No accounts to route %s %s to' % (method, path))
+        start = next(self.turn) % len(names)
+        best = None
+        best_headroom = None
+        for name in names[start:] + names[:start]:
+            headroom = self.client(name).rate_limiter.headroom(method, path)
+            if headroom is None:
+                return self.client(name)
+            if best is None or headroom > best_headroom:
+                best, best_headroom = name, headroom
+        return self.client(best)
+
+    def close(self):
+        with self.lock:
+            for api in self.clients.values():
+                api.close()
+            self.clients = {}
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+            for executor in self.executors.values():
+                executor.shutdown(wait=False)
+            self.executors = {}
+            if self.token_store is not None:
+                self.token_store.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,179 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from bisect import bisect_left, bisect_right
+import math
+import re
+import threading
+
+ROOM_NAME = re.compile(r'^([WE])(\d+)([NS])(\d+)$')
+
+
+## 'W1N1' -> (-2, -2), 'E0S0' -> (0, 0)
+def room_coords(room):
+    match = ROOM_NAME.match(room)
+    if not match:
+        raise ValueError('Invalid room name %s' % room)
+    h, x, v, y = match.groups()
+    x, y = int(x), int(y)
+    return (-x - 1 if h == 'W' else x), (-y - 1 if v == 'N' else y)
+
+
+## same as Game.map.getRoomLinearDistance without world wrapping
+def room_distance(a, b):
+    ax, ay = room_coords(a)
+    bx, by = room_coords(b)
+    return max(abs(ax - bx), abs(ay - by))
+
+
+## energy a terminal spends to send amount over distance rooms, as Game.market.calcTransactionCost
+def transaction_cost(amount, distance):
+    return int(math.ceil(amount * (1 - math.exp(-distance / 30.0))))
+
+
+class Side(object):
+    ## One side of one resource's book: orders sorted by price with a running total of amounts,
+    ## so the best price is the first or last entry and depth at a price is one bisect.
+
+    __slots__ = ('orders', 'prices', 'cumulative')
+
+    def __init__(self, orders):
+        self.orders = sorted(orders, key=lambda order: order['price'])
+        self.prices = [order['price'] for order in self.orders]
+        self.cumulative = [0]
+        for order in self.orders:
+            self.cumulative.append(self.cumulative[-1] + order.get('amount', 0))
+
+    def __len__(self):
+        return len(self.orders)
+
+    def total(self):
+        return self.cumulative[-1]
+
+    ## amount offered at prices up to and including price
+    def below(self, price):
+        return self.cumulative[bisect_right(self.prices, price)]
+
+    ## amount wanted at prices down to and including price
+    def above(self, price):
+        return self.cumulative[-1] - self.cumulative[bisect_left(self.prices, price)]
+
+
+class MarketBook(object):
+    ## Local copy of the market orders of one shard. orders_index gives the number of orders per
+    ## resource, and refresh() only refetches the resources whose count changed since the last
+    ## refresh (plus any listed in `resources`). Queries are answered from the local copy.
+
+    def __init__(self, api, shard=None, resources=None):
+        self.api = api
+        self.shard = shard
+        self.only = set(resources) if resources is not None else None
+        self.counts = {}
+        self.sells = {}
+        self.buys = {}
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    def index(self):
+        ret = self.api.orders_index(shard=self.shard)
+        return dict((entry['_id'], entry.get('count', 0)) for entry in ret.get('list', []))
+
+    ## refetches changed resources and returns the ones that were refetched
+    def refresh(self, resources=()):
+        counts = self.index()
+        changed = set(resources)
+        for resource, count in counts.items():
+            if self.counts.get(resource) != count:
+                changed.add(resource)
+        gone = [resource for resource in self.counts if resource not in counts]
+        if self.only is not None:
+            changed &= self.only
+        fetch = lambda resource: self.api.market_order_by_type(resource, shard=self.shard)
+        failed = None
+        for resource, ret in self.api.bulk(fetch, sorted(changed)):
+            if isinstance(ret, Exception):
+                ## forget its count so the next refresh fetches it again
+                failed = failed or ret
+                counts.pop(resource, None)
+                continue
+            self.load(resource, ret.get('list', []))
+        with self.lock:
+            for resource in gone:
+                self.drop(resource)
+            self.counts = counts
+        if failed is not None:
+            raise failed
+        return changed
+
+    def load(self, resource, orders):
+        with self.lock:
+            self.drop(resource)
+            self.sells[resource] = Side(o for o in orders if o.get('type') == 'sell')
+            self.buys[resource] = Side(o for o in orders if o.get('type') == 'buy')
+            for order in orders:
+                self.orders[order['_id']] = order
+
+    def drop(self, resource):
+        for side in (self.sells.pop(resource, None), self.buys.pop(resource, None)):
+            if side is not None:
+                for order in side.orders:
+                    self.orders.pop(order['_id'], None)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def resources(self):
+        return sorted(set(self.sells) | set(self.buys))
+
+    def side(self, resource, type):
+        book = self.sells if type == 'sell' else self.buys
+        return book.get(resource) or Side(())
+
+    ## cheapest sell order, or None
+    def best_ask(self, resource):
+        side = self.side(resource, 'sell')
+        return side.orders[0] if side.orders else None
+
+    ## highest buy order, or None
+    def best_bid(self, resource):
+        side = self.side(resource, 'buy')
+        return side.orders[-1] if side.orders else None
+
+    def spread(self, resource):
+        ask, bid = self.best_ask(resource), self.best_bid(resource)
+        if ask is None or bid is None:
+            return None
+        return ask['price'] - bid['price']
+
+    ## amount that can be bought at or below price ('sell'), or sold at or above it ('buy')
+    def depth(self, resource, price, type='sell'):
+        side = self.side(resource, type)
+        return side.below(price) if type == 'sell' else side.above(price)
+
+    ## Best order to trade up to `amount` of resource with from room, counting the energy the
+    ## terminal spends as energy_price credits each (the cheapest energy ask by default).
+    ## Returns (order, units, credits, energy) where credits is what buying the units costs
+    ## ('sell' orders) or what selling them earns ('buy' orders), or None. Orders are walked
+    ## from the best price and the walk stops once the price alone is no better.
+    def best_delivered(self, resource, room, amount, type='sell', energy_price=None):
+        if energy_price is None:
+            ask = self.best_ask('energy')
+            energy_price = ask['price'] if ask is not None else 0
+        side = self.side(resource, type)
+        sign = 1 if type == 'sell' else -1
+        best = None
+        best_unit = None
+        for order in (side.orders if type == 'sell' else reversed(side.orders)):
+            if order.get('amount', 0) <= 0:
+                continue
+            if best is not None and sign * order['price'] >= sign * best_unit:
+                break
+            units = min(amount, order['amount'])
+            distance = room_distance(room, order['roomName']) if order.get('roomName') else 0
+            energy = transaction_cost(units, distance)
+            credits = order['price'] * units + sign * energy * energy_price
+            unit = credits / float(units)
+            if best is None or sign * unit < sign * best_unit:
+                best = (order, units, credits, energy)
+                best_unit = unit
+        return best
@@ -0,0 +1,251 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+from collections import defaultdict
+import threading
+import time
+
+## latency buckets in seconds and size buckets in bytes, Prometheus style upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+## collapses paths that embed room names or ticks so they can be used as labels
+def endpoint_name(path):
+    path = path.split('?', 1)[0]
+    if path.startswith('../room-history'):
+        return '../room-history'
+    return path
+
+
+## 'room:shard0/W1N1' -> 'room', 'user:<id>/memory/creeps' -> 'user:memory'
+def channel_kind(channel):
+    if channel is None:
+        return 'unknown'
+    kind, _, rest = channel.partition(':')
+    if kind == 'user':
+        parts = rest.split('/')
+        return 'user:' + parts[1] if len(parts) > 1 else kind
+    return kind
+
+
+class RequestEvent(object):
+    __slots__ = ('endpoint', 'method', 'status', 'bytes_in', 'bytes_out', 'ttfb', 'elapsed',
+                 'parse_time', 'retries', 'ratelimit_remaining', 'cached', 'error')
+
+    def __init__(self, endpoint, method, status=None, bytes_in=0, bytes_out=0, ttfb=None, elapsed=None,
+                 parse_time=None, retries=0, ratelimit_remaining=None, cached=False, error=None):
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.ttfb = ttfb
+        self.elapsed = elapsed
+        self.parse_time = parse_time
+        self.retries = retries
+        self.ratelimit_remaining = ratelimit_remaining
+        self.cached = cached
+        self.error = error
+
+
+class MessageEvent(object):
+    __slots__ = ('channel', 'bytes', 'compressed', 'decompress_time', 'handler_time', 'queue_time', 'received')
+
+    def __init__(self, channel, bytes, compressed=False, decompress_time=0.0, handler_time=0.0, queue_time=0.0,
+                 received=None):
+        self.channel = channel
+        self.bytes = bytes
+        self.compressed = compressed
+        self.decompress_time = decompress_time
+        self.handler_time = handler_time
+        self.queue_time = queue_time
+        self.received = received
+
+
+class Observer(object):
+    ## Base class for API and Socket instrumentation, register with api.observe() or socket.observe().
+
+    def request(self, event):
+        pass
+
+    def message(self, event):
+        pass
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    ## upper bound of the bucket holding the q-th quantile
+    def quantile(self, q):
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return None
+
+
+class MetricsAggregator(Observer):
+    ## Aggregates events into counters and histograms per endpoint and channel kind, and exports
+    ## them in the Prometheus text format or as StatsD lines.
+
+    def __init__(self, prefix='screepsapi'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.cache_hits = defaultdict(int)
+        self.bytes_in = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+        self.headroom = {}
+        self.latency = defaultdict(Histogram)
+        self.ttfb = defaultdict(Histogram)
+        self.parse_time = defaultdict(Histogram)
+        self.response_size = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.messages = defaultdict(int)
+        self.message_bytes = defaultdict(int)
+        self.decompress_time = defaultdict(Histogram)
+        self.handler_time = defaultdict(Histogram)
+        self.queue_time = defaultdict(Histogram)
+
+        ## totals as of the last statsd() export
+        self.exported = {}
+
+    def request(self, event):
+        key = (event.method, event.endpoint)
+        with self.lock:
+            self.requests[key + ('cached' if event.cached else str(event.status),)] += 1
+            self.retries[key] += event.retries
+            if event.error is not None:
+                self.errors[key] += 1
+            if event.cached:
+                self.cache_hits[key] += 1
+            self.bytes_in[key] += event.bytes_in
+            self.bytes_out[key] += event.bytes_out
+            if event.ratelimit_remaining is not None:
+                self.headroom[key] = event.ratelimit_remaining
+            if event.elapsed is not None:
+                self.latency[key].observe(event.elapsed)
+            if event.ttfb is not None:
+                self.ttfb[key].observe(event.ttfb)
+            if event.parse_time is not None:
+                self.parse_time[key].observe(event.parse_time)
+            self.response_size[key].observe(event.bytes_in)
+
+    def message(self, event):
+        kind = channel_kind(event.channel)
+        with self.lock:
+            self.messages[kind] += 1
+            self.message_bytes[kind] += event.bytes
+            if event.compressed:
+                self.decompress_time[kind].observe(event.decompress_time)
+            self.handler_time[kind].observe(event.handler_time)
+            self.queue_time[kind].observe(event.queue_time)
+
+    ## messages per second per channel kind since the aggregator was created
+    def message_rates(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self.lock:
+            return dict((kind, count / elapsed) for kind, count in self.messages.items())
+
+    def prometheus(self):
+        lines = []
+        name = self.prefix
+
+        def labels(key):
+            if len(key) == 1:
+                return '{channel="%s"}' % key
+            text = 'method="%s",endpoint="%s"' % key[:2]
+            if len(key) > 2:
+                text += ',status="%s"' % key[2]
+            return '{%s}' % text
+
+        def counter(metric, values, kind='counter'):
+            lines.append('# TYPE %s_%s %s' % (name, metric, kind))
+            for key, value in sorted(values.items()):
+                lines.append('%s_%s%s %s' % (name, metric, labels(key if isinstance(key, tuple) else (key,)), value))
+
+        def histogram(metric, values):
+            lines.append('# TYPE %s_%s histogram' % (name, metric))
+            for key, hist in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                base = labels(key)[1:-1]
+                cumulative = 0
+                for bound, count in zip(list(hist.buckets) + ['+Inf'], hist.counts):
+                    cumulative += count
+                    lines.append('%s_%s_bucket{%s,le="%s"} %d' % (name, metric, base, bound, cumulative))
+                lines.append('%s_%s_sum{%s} %s' % (name, metric, base, hist.sum))
+                lines.append('%s_%s_count{%s} %d' % (name, metric, base, hist.count))
+
+        with self.lock:
+            counter('requests_total', self.requests)
+            counter('request_errors_total', self.errors)
+            counter('request_retries_total', self.retries)
+            counter('cache_hits_total', self.cache_hits)
+            counter('bytes_received_total', self.bytes_in)
+            counter('bytes_sent_total', self.bytes_out)
+            counter('ratelimit_remaining', self.headroom, 'gauge')
+            histogram('request_seconds', self.latency)
+            histogram('ttfb_seconds', self.ttfb)
+            histogram('parse_seconds', self.parse_time)
+            histogram('response_bytes', self.response_size)
+            counter('messages_total', self.messages)
+            counter('message_bytes_total', self.message_bytes)
+            histogram('decompress_seconds', self.decompress_time)
+            histogram('handler_seconds', self.handler_time)
+            histogram('queue_seconds', self.queue_time)
+        return '\n'.join(lines) + '\n'
+
+    ## StatsD counters and timers are deltas, so each call only reports what happened since the last one
+    def statsd(self):
+        lines = []
+
+        def metric(key):
+            parts = [self.prefix] + [str(k).replace('/', '_').replace('.', '_').replace(':', '_') for k in key]
+            return '.'.join(parts)
+
+        def counter(name, value):
+            delta = value - self.exported.get(name, 0)
+            self.exported[name] = value
+            if delta:
+                lines.append('%s:%d|c' % (name, delta))
+
+        def timer(name, hist):
+            last_sum, last_count = self.exported.get(name, (0.0, 0))
+            self.exported[name] = (hist.sum, hist.count)
+            if hist.count > last_count:
+                lines.append('%s:%.3f|ms' % (name, (hist.sum - last_sum) / (hist.count - last_count) * 1000))
+
+        with self.lock:
+            for key, value in self.requests.items():
+                counter('%s.requests' % metric(key), value)
+            for key, value in self.errors.items():
+                counter('%s.errors' % metric(key), value)
+            for key, value in self.headroom.items():
+                lines.append('%s.ratelimit_remaining:%d|g' % (metric(key), value))
+            for key, hist in self.latency.items():
+                timer('%s.request_ms' % metric(key), hist)
+            for kind, value in self.messages.items():
+                counter('%s.messages' % metric(('socket', kind)), value)
+            for kind, hist in self.handler_time.items():
+                timer('%s.handler_ms' % metric(('socket', kind)), hist)
+        return lines
@@ -0,0 +1,122 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import threading
+import time
+
+## calls that may dip into the reserved part of a rate limit window
+URGENT_REQUESTS = (
+    ('POST', 'user/console'),
+    ('POST', 'user/memory'),
+    ('POST', 'user/memory-segment'),
+)
+
+## share of every window held back for urgent calls
+DEFAULT_RESERVE = 0.1
+
+## how long to back off after a 429 that did not say when the window resets
+DEFAULT_PENALTY = 1.0
+
+
+class Bucket(object):
+    __slots__ = ('limit', 'remaining', 'reset', 'inflight', 'penalty')
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.inflight = 0
+        ## end of a one-off back off after a 429 on an endpoint whose limit is unknown
+        self.penalty = None
+
+
+class RateLimiter(object):
+    ## Client side token buckets keyed per method and endpoint path. Limits are learned from
+    ## the X-RateLimit-* response headers; until a bucket has seen them calls pass straight through.
+    ## Thread safe, so one limiter can be shared by the bulk helpers and several clients.
+
+    def __init__(self, reserve=DEFAULT_RESERVE, urgent=URGENT_REQUESTS):
+        self.reserve = reserve
+        self.urgent = frozenset(urgent)
+        self.buckets = {}
+        self.cond = threading.Condition()
+
+    def key(self, method, path):
+        return method.upper(), path.split('?', 1)[0]
+
+    def is_urgent(self, method, path):
+        return self.key(method, path) in self.urgent
+
+    def bucket(self, method, path):
+        key = self.key(method, path)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket()
+        return bucket
+
+    ## blocks until the endpoint has budget left, urgent calls may use the reserved share
+    def acquire(self, method, path, urgent=None):
+        if urgent is None:
+            urgent = self.is_urgent(method, path)
+        with self.cond:
+            bucket = self.bucket(method, path)
+            while True:
+                now = time.time()
+                if bucket.penalty is not None:
+                    if now < bucket.penalty:
+                        self.cond.wait(bucket.penalty - now)
+                        continue
+                    bucket.penalty = None
+                if bucket.remaining is None:
+                    break
+                if bucket.reset is not None and now >= bucket.reset:
+                    ## window rolled over, trust the old limit until the server says otherwise; the
+                    ## guessed window ends too, so calls that fail without headers cannot exhaust it for good
+                    bucket.remaining = bucket.limit - bucket.inflight
+                    bucket.reset = now + DEFAULT_PENALTY
+                floor = 0 if urgent else int(bucket.limit * self.reserve)
+                if bucket.remaining > floor:
+                    bucket.remaining -= 1
+                    break
+                ## no window to wait out, start a fresh one from the known limit
+                if bucket.reset is None:
+                    bucket.remaining = bucket.limit - bucket.inflight
+                    bucket.reset = now + DEFAULT_PENALTY
+                    if bucket.remaining > floor:
+                        bucket.remaining -= 1
+                        break
+                self.cond.wait(bucket.reset - now if bucket.reset is not None else DEFAULT_PENALTY)
+            bucket.inflight += 1
+
+    ## records the outcome of a call started with acquire
+    def release(self, method, path, headers=None, throttled=False):
+        with self.cond:
+            bucket = self.bucket(method, path)
+            bucket.inflight = max(bucket.inflight - 1, 0)
+            if headers is not None and 'X-RateLimit-Limit' in headers and 'X-RateLimit-Reset' in headers:
+                reset = float(headers['X-RateLimit-Reset'])
+                ## screeps.com sends epoch seconds, some private servers send milliseconds
+                reset = reset / 1000 if reset > 1e11 else reset
+                ## late answers from a window that already ended say nothing about the current one
+                if reset > time.time():
+                    bucket.limit = int(headers['X-RateLimit-Limit'])
+                    remaining = int(headers.get('X-RateLimit-Remaining', bucket.limit)) - bucket.inflight
+                    ## answers within a window can arrive out of order, keep the lowest count seen
+                    if reset == bucket.reset and bucket.remaining is not None:
+                        remaining = min(remaining, bucket.remaining)
+                    bucket.remaining = remaining
+                    bucket.reset = reset
+            if throttled:
+                if bucket.limit is None:
+                    ## nothing to go on, back off once and stay unlimited until real headers arrive
+                    bucket.penalty = time.time() + DEFAULT_PENALTY
+                else:
+                    bucket.remaining = 0
+                    if bucket.reset is None or bucket.reset <= time.time():
+                        bucket.reset = time.time() + DEFAULT_PENALTY
+            self.cond.notify_all()
+
+    ## remaining calls in the current window, or None if the endpoint's limit is unknown
+    def headroom(self, method, path):
+        with self.cond:
+            return self.bucket(method, path).remaining
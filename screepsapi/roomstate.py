@@ -0,0 +1,169 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import copy
+import threading
+
+
+## applies a diff onto an object in place: nested objects merge and None removes the key
+def apply_diff(obj, diff):
+    for key, value in diff.items():
+        if value is None:
+            obj.pop(key, None)
+        elif isinstance(value, dict) and isinstance(obj.get(key), dict):
+            apply_diff(obj[key], value)
+        else:
+            obj[key] = value
+
+
+## 'room:shard0/W1N1' -> ('shard0', 'W1N1'), 'room:W1N1' -> (None, 'W1N1')
+def parse_room_channel(channel):
+    name = channel.split(':', 1)[1]
+    if '/' in name:
+        shard, room = name.split('/', 1)
+        return shard, room
+    return None, name
+
+
+class RoomState(object):
+    ## Live objects of one room rebuilt from the full first message and the diffs after it.
+    ## Objects sit in a list of slots (freed slots are reused) with the id, type and position
+    ## indexes pointing at slot numbers, so diffs are applied in place without copying.
+
+    def __init__(self, room=None, shard=None):
+        self.room = room
+        self.shard = shard
+        self.game_time = None
+        self.info = {}
+        self.slots = []
+        self.free = []
+        self.ids = {}
+        self.types = {}
+        self.positions = {}
+
+    def reset(self):
+        RoomState.__init__(self, self.room, self.shard)
+
+    def index(self, slot, obj):
+        self.types.setdefault(obj.get('type'), set()).add(slot)
+        self.positions.setdefault((obj.get('x'), obj.get('y')), set()).add(slot)
+
+    def unindex(self, slot, obj):
+        for table, key in ((self.types, obj.get('type')), (self.positions, (obj.get('x'), obj.get('y')))):
+            slots = table.get(key)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del table[key]
+
+    def insert(self, _id, obj):
+        if self.free:
+            slot = self.free.pop()
+            self.slots[slot] = obj
+        else:
+            slot = len(self.slots)
+            self.slots.append(obj)
+        self.ids[_id] = slot
+        self.index(slot, obj)
+
+    def remove(self, _id):
+        slot = self.ids.pop(_id, None)
+        if slot is not None:
+            self.unindex(slot, self.slots[slot])
+            self.slots[slot] = None
+            self.free.append(slot)
+
+    def update(self, _id, diff):
+        slot = self.ids[_id]
+        obj = self.slots[slot]
+        moved = 'type' in diff or 'x' in diff or 'y' in diff
+        if moved:
+            self.unindex(slot, obj)
+        apply_diff(obj, diff)
+        if moved:
+            self.index(slot, obj)
+
+    ## applies the data of a room message (or a history tick) to the state
+    def apply(self, data):
+        for _id, diff in (data.get('objects') or {}).items():
+            if diff is None:
+                self.remove(_id)
+            elif _id in self.ids:
+                self.update(_id, diff)
+            else:
+                self.insert(_id, dict(diff))
+        if data.get('gameTime') is not None:
+            self.game_time = data['gameTime']
+        for key, value in data.items():
+            ## 'backfill' marks ticks Socket replayed from history, it describes the message rather than the room
+            if key in ('objects', 'gameTime', 'backfill'):
+                continue
+            if isinstance(value, dict) and isinstance(self.info.get(key), dict):
+                apply_diff(self.info[key], value)
+            else:
+                self.info[key] = value
+
+    ## diff that turns the state into a full set of objects, as sent again after resubscribing
+    def replace_diff(self, objects):
+        diff = dict((_id, None) for _id in self.ids if _id not in objects)
+        diff.update(objects)
+        return diff
+
+    def get(self, _id):
+        slot = self.ids.get(_id)
+        return self.slots[slot] if slot is not None else None
+
+    def of_type(self, type):
+        return [self.slots[slot] for slot in self.types.get(type, ())]
+
+    def at(self, x, y):
+        return [self.slots[slot] for slot in self.positions.get((x, y), ())]
+
+    def __iter__(self):
+        return (obj for obj in self.slots if obj is not None)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, _id):
+        return _id in self.ids
+
+    ## independent deep copy of every object keyed by id
+    def snapshot(self):
+        return dict((_id, copy.deepcopy(self.slots[slot])) for _id, slot in self.ids.items())
+
+
+class RoomStore(object):
+    ## RoomState per room channel, fed by Socket when created with track_rooms=True.
+
+    def __init__(self):
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def state(self, channel):
+        state = self.rooms.get(channel)
+        if state is None:
+            with self.lock:
+                state = self.rooms.get(channel)
+                if state is None:
+                    shard, room = parse_room_channel(channel)
+                    state = self.rooms[channel] = RoomState(room, shard)
+        return state
+
+    def apply(self, channel, data):
+        state = self.state(channel)
+        state.apply(data)
+        return state
+
+    def get(self, room, shard=None):
+        channel = 'room:%s/%s' % (shard, room) if shard else 'room:' + room
+        return self.rooms.get(channel)
+
+    def __getitem__(self, channel):
+        return self.rooms[channel]
+
+    def __iter__(self):
+        return iter(list(self.rooms.values()))
+
+    def __len__(self):
+        return len(self.rooms)
@@ -1,25 +1,21 @@
 # Copyright @dzhu, @tedivm, @admon84
 # https://github.com/screepers/python-screeps
 
-from base64 import b64decode
 from collections import OrderedDict
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from io import StringIO
-
-from io import BytesIO
-from gzip import GzipFile
 import json
 import logging
+import random
 import requests
-import ssl
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 import sys
-import websocket
-import zlib
+import threading
+import time
+
+from screepsapi.codec import GZIP_PREFIX, channel_of, decode_payload, inflate_message, loads
+from screepsapi.ratelimit import RateLimiter
 
-## Python before 2.7.10 or so has somewhat broken SSL support that throws a warning; suppress it
-import warnings; warnings.filterwarnings('ignore', message='.*true sslcontext object.*')
+## the socket, metrics, caching, terrain and columnar modules are imported where first used
 
 # Constants
 OFFICIAL_HOST = 'screeps.com'
@@ -27,42 +23,331 @@ PTR_PREFIX = '/ptr'
 DEFAULT_SHARD = 'shard0'
 OFFICIAL_HISTORY_INTERVAL = 100
 PRIVATE_HISTORY_INTERVAL = 20
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PING_INTERVAL = 10
+
+## dispatch.BLOCK, spelled out so the dispatch module only loads with a Socket
+DEFAULT_OVERFLOW = 'block'
+DEFAULT_RECONNECT_BACKOFF = 1
+MAX_RECONNECT_BACKOFF = 60
+
+## (connect, read) seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+RETRY_STATUSES = (502, 503, 504)
+
+## GETs worth a duplicate when slow, see hedged()
+HEDGED_REQUESTS = ('game/time', 'user/memory')
+DEFAULT_HEDGE_DELAY = 0.5
+HEDGE_MIN_SAMPLES = 20
+
+
+## whether a failed call can be retried without risking it being applied twice
+def retryable(method, error):
+    if method == 'GET':
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    ## a POST may only be retried when it never reached the server
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
 
 class API(object):
     
-    def req(self, func, path, **args):
-        r = func(self.url + path, headers={'X-Token': self.token, 'X-Username': self.token}, **args)
+    def send(self, method, path, **args):
+        if method == 'GET' and path in self.hedge:
+            return self.hedged(method, path, **args)
+        return self.attempt(method, path, **args)
+
+    ## exponential backoff with jitter before retry number `retry`
+    def backoff_delay(self, retry):
+        return min(self.backoff * 2 ** (retry - 1), MAX_BACKOFF) * random.uniform(0.5, 1)
+
+    def attempt(self, method, path, **args):
+        limiter = self.rate_limiter
+        retries = 0
+        failures = 0
+        signed_in = False
+        args.setdefault('timeout', self.timeout)
+        while True:
+            if limiter is not None:
+                limiter.acquire(method, path)
+            r = None
+            began = time.time()
+            try:
+                r = self.session.request(method, self.url + path, headers={'X-Token': self.token, 'X-Username': self.token}, **args)
+            except requests.RequestException as e:
+                if failures < self.retries and retryable(method, e):
+                    failures += 1
+                    retries += 1
+                    time.sleep(self.backoff_delay(failures))
+                    continue
+                if self.observers:
+                    from screepsapi.metrics import RequestEvent, endpoint_name
+                    self.notify(RequestEvent(endpoint_name(path), method, elapsed=time.time() - began, retries=retries, error=e))
+                raise
+            finally:
+                if limiter is not None:
+                    limiter.release(method, path, r.headers if r is not None else None,
+                                    throttled=r is not None and r.status_code == 429)
+            ## a stored token may have expired while the client was not running, sign in again once
+            if r.status_code == 401 and self.credentials is not None and not signed_in and path != 'auth/signin':
+                signed_in = True
+                self.login()
+                retries += 1
+                continue
+            ## gateway errors are usually a restarting server, reads are safe to try again
+            if r.status_code in RETRY_STATUSES and method == 'GET' and failures < self.retries:
+                failures += 1
+                retries += 1
+                time.sleep(self.backoff_delay(failures))
+                continue
+            ## a 429 means the limiter's view was stale, it now waits out the window before retrying;
+            ## capped like the gateway errors so a server that keeps refusing surfaces as an HTTPError
+            if limiter is None or r.status_code != 429 or failures >= self.retries:
+                break
+            failures += 1
+            retries += 1
+        r.duration = time.time() - began
+        r.retries = retries
+        if path in self.latencies:
+            with self.lock:
+                self.latencies[path].observe(r.duration)
+        if not r.ok and self.observers:
+            self.notify(self.request_event(method, path, r, error=r.reason))
         r.raise_for_status()
-        if 'X-Token' in r.headers and len(r.headers['X-Token']) >= 40:
+        if 'X-Token' in r.headers and len(r.headers['X-Token']) >= 40 and r.headers['X-Token'] != self.token:
             self.token = r.headers['X-Token']
+            if self.token_store is not None and self.token_key is not None:
+                self.token_store.set(self.token_key, self.token)
+        return r
+
+    ## p95 latency of a hedged path, or the default delay until enough calls were seen
+    def hedge_delay(self, path):
+        with self.lock:
+            histogram = self.latencies[path]
+            if histogram.count < HEDGE_MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            delay = histogram.quantile(0.95)
+            return delay if delay != float('inf') else histogram.buckets[-1]
+
+    ## Sends a duplicate of a read that has not answered within the path's p95 latency and
+    ## returns whichever answers first. Only the first failure is ignored, if both fail the
+    ## error of the second is raised.
+    def hedged(self, method, path, **args):
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        if self.hedger is None:
+            self.hedger = ThreadPoolExecutor(max_workers=self.concurrency * 2)
+        pending = set([self.hedger.submit(self.attempt, method, path, **args)])
+        done, _ = wait(pending, timeout=self.hedge_delay(path))
+        if not done:
+            pending.add(self.hedger.submit(self.attempt, method, path, **args))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def parse(self, body):
         try:
-            return json.loads(r.text, object_pairs_hook=OrderedDict)
+            if self.ordered:
+                return json.loads(body.decode('utf-8'), object_pairs_hook=OrderedDict)
+            return loads(body)
         except ValueError:
-            print('JSON failure:', r.text)
+            print('JSON failure:', body.decode('utf-8', 'replace'))
         return None
 
-    def get(self, _path, **args): return self.req(requests.get, _path, params=args)
-    def post(self, _path, **args): return self.req(requests.post, _path, json=args)
+    ## parses a response from send and reports it to the observers
+    def receive(self, method, path, r):
+        began = time.time()
+        ret = self.parse(r.content)
+        if self.observers:
+            error = 'invalid JSON' if ret is None and r.content.strip() != b'null' else None
+            self.notify(self.request_event(method, path, r, parse_time=time.time() - began, error=error))
+        return ret
+
+    def req(self, method, path, **args):
+        return self.receive(method, path, self.send(method, path, **args))
+
+    def get(self, _path, **args):
+        ttl = self.cache.ttl(_path) if self.cache is not None else None
+        if ttl is None:
+            return self.req('GET', _path, params=args)
+        key = self.cache.key(self.url + _path, args)
+        body = self.cache.get(key)
+        if body is None:
+            r = self.send('GET', _path, params=args)
+            self.cache.put(key, r.content, ttl)
+            return self.receive('GET', _path, r)
+        began = time.time()
+        ret = self.parse(body)
+        if self.observers:
+            from screepsapi.metrics import RequestEvent, endpoint_name
+            self.notify(RequestEvent(endpoint_name(_path), 'GET', bytes_in=len(body), parse_time=time.time() - began, cached=True))
+        return ret
+
+    def post(self, _path, **args): return self.req('POST', _path, json=args)
 
-    def __init__(self, u=None, p=None, token=None, host=None, prefix=None, secure=True, ptr=False):
+    def __init__(self, u=None, p=None, token=None, host=None, prefix=None, secure=True, ptr=False,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 keep_alive=True, max_retries=0, session=None, concurrency=DEFAULT_CONCURRENCY,
+                 rate_limit=True, terrain_cache=True, cache=None, ordered=False,
+                 token_store=None, token_key=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, hedge=False, executor=None):
         prefix = PTR_PREFIX if ptr else prefix
         
         self.host = host
         self.prefix = prefix
         self.secure = secure
 
+        ## responses are plain dicts parsed by the fastest installed JSON backend, ordered=True restores OrderedDicts
+        self.ordered = ordered
+
+        ## metrics.Observer instances told about every request, see observe()
+        self.observers = []
+
+        ## one pooled session per client so connections (and TLS handshakes) are reused across calls
+        self.owns_session = session is None
+        self.session = session if session is not None else self.make_session(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive, max_retries=max_retries)
+
+        ## cap on requests in flight to this host from the bulk helpers; clients sharing a session
+        ## should share an executor too (see ClientManager) so the cap holds for the host as a whole
+        self.concurrency = concurrency
+        self.owns_executor = executor is None
+        self.executor = executor
+        self.writes = None
+        self.lock = threading.Lock()
+
+        ## (connect, read) timeout, and how often timeouts, dropped connections and 502/503/504 are
+        ## retried: GETs always, POSTs only when the connection was never made
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        ## True hedges HEDGED_REQUESTS, or pass the paths to hedge
+        if hedge is True:
+            hedge = HEDGED_REQUESTS
+        self.hedge = frozenset(hedge or ())
+        self.hedger = None
+        self.latencies = {}
+        if self.hedge:
+            from screepsapi.metrics import Histogram
+            self.latencies = dict((path, Histogram()) for path in self.hedge)
+
+        ## True for a private limiter, or pass a RateLimiter to share one between clients
+        if rate_limit is True:
+            rate_limit = RateLimiter()
+        self.rate_limiter = rate_limit or None
+
+        ## True keeps terrain in memory, a path also persists it to disk, or pass a TerrainCache to share one;
+        ## True and paths are turned into a TerrainCache on first use
+        self.terrain_cache = terrain_cache
+
+        ## True caches read-only responses in memory, a path caches them on disk, or pass a ResponseCache
+        if cache is True or isinstance(cache, str):
+            from screepsapi.cache import DiskBackend, ResponseCache
+            cache = ResponseCache(DiskBackend(cache) if cache is not True else None)
+        self.cache = cache or None
+        self.cache_host = (host if host else OFFICIAL_HOST) + (prefix if prefix else '')
+
         self.url = 'https://' if secure else 'http://'
         self.url += host if host else OFFICIAL_HOST
         self.url += prefix if prefix else ''
         self.url += '/api/'
 
+        ## a TokenStore keeps the rotated session token across restarts, keyed by user and server
+        if isinstance(token_store, str):
+            from screepsapi.manager import TokenStore
+            token_store = TokenStore(token_store)
+        self.token_store = token_store
+        if token_key is None and u is not None:
+            token_key = '%s@%s' % (u, self.cache_host)
+        self.token_key = token_key
+        self.credentials = None
+
         self.token = None
         if u is not None and p is not None:
-            signin = self.signin(email=u, password=p)
-            self.token = signin['token']
+            self.credentials = (u, p)
+            stored = self.token_store.get(self.token_key) if self.token_store is not None else None
+            if stored is not None:
+                self.token = stored
+            else:
+                self.login()
         elif token is not None:
             self.token = token
 
+    @staticmethod
+    def make_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                     keep_alive=True, max_retries=0):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    #### instrumentation
+
+    def observe(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    def notify(self, event):
+        for observer in self.observers:
+            observer.request(event)
+
+    def request_event(self, method, path, r, parse_time=None, error=None):
+        from screepsapi.metrics import RequestEvent, endpoint_name
+        body = r.request.body if r.request is not None else None
+        return RequestEvent(
+            endpoint_name(path), method, status=r.status_code, bytes_in=len(r.content),
+            bytes_out=len(body) if body else 0, ttfb=r.elapsed.total_seconds(),
+            elapsed=getattr(r, 'duration', None), parse_time=parse_time, retries=getattr(r, 'retries', 0),
+            ratelimit_remaining=self.rate_limiter.headroom(method, path) if self.rate_limiter is not None else None,
+            error=error)
+
+    ## write-behind buffer for set_segment and set_memory, see WriteBuffer
+    def write_buffer(self, **kwargs):
+        if self.writes is None:
+            from screepsapi.writebuffer import WriteBuffer
+            self.writes = WriteBuffer(self, **kwargs)
+        return self.writes
+
+    def close(self):
+        if self.writes is not None:
+            self.writes.close()
+            self.writes = None
+        if self.executor is not None:
+            if self.owns_executor:
+                self.executor.shutdown(wait=False)
+            self.executor = None
+        if self.hedger is not None:
+            self.hedger.shutdown(wait=False)
+            self.hedger = None
+        if self.token_store is not None:
+            self.token_store.flush()
+        if self.session is not None:
+            if self.owns_session:
+                self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
     #### auth methods
 
@@ -71,6 +356,11 @@ class API(object):
     
     def signin(self, email=None, password=None):
         return self.post('auth/signin', email=email, password=password)
+
+    def login(self):
+        self.token = self.signin(email=self.credentials[0], password=self.credentials[1])['token']
+        if self.token_store is not None and self.token_key is not None:
+            self.token_store.set(self.token_key, self.token)
     
     def steam_ticket(self, ticket, useNativeAuth=False):
         return self.post('auth/steam-ticket', ticket=ticket, useNativeAuth=useNativeAuth)
@@ -142,29 +432,20 @@ class API(object):
     def tutorial_done(self):
         return self.post('user/tutorial-done')
 
-    def memory(self, path='', shard=DEFAULT_SHARD):
+    ## raw=True returns the decompressed JSON bytes, select='a.b' parses only that part of the blob
+    def memory(self, path='', shard=DEFAULT_SHARD, raw=False, select=None):
         ret = self.get('user/memory', path=path, shard=shard)
-        if 'data' in ret:
-            try:
-                gzip_input = StringIO(b64decode(ret['data'][3:]))
-            except:
-                gzip_input = BytesIO(b64decode(ret['data'][3:]))
-            gzip_string = GzipFile(fileobj=gzip_input).read().decode("utf-8")
-            ret['data'] = json.loads(gzip_string)
+        if 'data' in ret and ret['data'] and ret['data'][:3] == GZIP_PREFIX:
+            ret['data'] = decode_payload(ret['data'], raw=raw, select=select)
         return ret
 
     def set_memory(self, path, value, shard=DEFAULT_SHARD):
         return self.post('user/memory', path=path, value=value, shard=shard)
 
-    def get_segment(self, segment, shard=DEFAULT_SHARD):
+    def get_segment(self, segment, shard=DEFAULT_SHARD, raw=False, select=None):
         ret = self.get('user/memory-segment', segment=segment, shard=shard)
-        if 'data' in ret and ret['data'][:3] == 'gz:':
-            try:
-                gzip_input = StringIO(b64decode(ret['data'][3:]))
-            except:
-                gzip_input = BytesIO(b64decode(ret['data'][3:]))
-            gzip_string = GzipFile(fileobj=gzip_input).read().decode("utf-8")
-            ret['data'] = json.loads(gzip_string)
+        if 'data' in ret and ret['data'] and ret['data'][:3] == GZIP_PREFIX:
+            ret['data'] = decode_payload(ret['data'], raw=raw, select=select)
         return ret
 
     def set_segment(self, segment, data, shard=DEFAULT_SHARD):
@@ -205,12 +486,41 @@ class API(object):
         else:
             return self.get('game/room-terrain', room=room, shard=shard)
 
+    @property
+    def terrain_cache(self):
+        option = self.terrain_option
+        if option is True or isinstance(option, str):
+            from screepsapi.terrain import TerrainCache
+            self.terrain_option = TerrainCache(option if option is not True else None)
+        return self.terrain_option or None
+
+    @terrain_cache.setter
+    def terrain_cache(self, terrain_cache):
+        self.terrain_option = terrain_cache
+
+    ## packed Terrain for a room, only fetched from the server the first time it is asked for
+    def terrain(self, room, shard=DEFAULT_SHARD):
+        if self.terrain_cache is not None:
+            terrain = self.terrain_cache.get(self.cache_host, shard, room)
+            if terrain is not None:
+                return terrain
+        encoded = self.room_terrain(room, encoded=True, shard=shard)['terrain'][0]['terrain']
+        if self.terrain_cache is None:
+            from screepsapi.terrain import Terrain, pack
+            return Terrain(room, pack(encoded))
+        return self.terrain_cache.put(self.cache_host, shard, room, encoded)
+
     def room_status(self, room, shard=DEFAULT_SHARD):
         return self.get('game/room-status', room=room, shard=shard)
 
     def room_objects(self, room, shard=DEFAULT_SHARD):
         return self.get('game/room-objects', room=room, shard=shard)
 
+    ## room objects as a dict of columns, or a numpy record array with numpy=True
+    def room_objects_columns(self, room, shard=DEFAULT_SHARD, numpy=False, fields=None):
+        from screepsapi import columnar
+        return columnar.room_objects_columns(self.room_objects(room, shard=shard), fields or columnar.ROOM_OBJECT_FIELDS, numpy)
+
     def room_decorations(self, room, shard=DEFAULT_SHARD):
         return self.get('game/room-decorations', room=room, shard=shard)
 
@@ -226,6 +536,11 @@ class API(object):
     def market_order_by_type(self, resourceType, shard=DEFAULT_SHARD):
         return self.get('game/market/orders', resourceType=resourceType, shard=shard)
 
+    ## price/amount/roomName... columns of a resource's orders, or a numpy record array with numpy=True
+    def market_order_columns(self, resourceType, shard=DEFAULT_SHARD, numpy=False, fields=None):
+        from screepsapi import columnar
+        return columnar.market_orders_columns(self.market_order_by_type(resourceType, shard=shard), fields or columnar.MARKET_ORDER_FIELDS, numpy)
+
     def market_history(self, page=0):
         return self.get('user/money-history', page=page)
 
@@ -366,6 +681,10 @@ class API(object):
     def map_stats(self, rooms, statName, shard=DEFAULT_SHARD):
         return self.post('game/map-stats', rooms=rooms, statName=statName, shard=shard)
 
+    def map_stats_columns(self, rooms, statName, shard=DEFAULT_SHARD, numpy=False, fields=None):
+        from screepsapi import columnar
+        return columnar.map_stats_columns(self.map_stats(rooms, statName, shard=shard), fields or columnar.MAP_STATS_FIELDS, numpy)
+
     def worldsize(self, shard=DEFAULT_SHARD):
         return self.get('game/world-size', shard=shard)
 
@@ -375,12 +694,17 @@ class API(object):
     def world_start_room(self, shard=None):
         return self.get('user/world-start-room', shard=shard)
 
+    @property
+    def history_interval(self):
+        if self.host in (None, OFFICIAL_HOST):
+            return OFFICIAL_HISTORY_INTERVAL
+        return PRIVATE_HISTORY_INTERVAL
+
     def history(self, room, tick, shard=DEFAULT_SHARD):
-        if self.host == OFFICIAL_HOST:
-            tick -= (tick % OFFICIAL_HISTORY_INTERVAL)
+        tick -= (tick % self.history_interval)
+        if self.host in (None, OFFICIAL_HOST):
             return self.get('../room-history/%s/%s/%s.json' % (shard, room, tick))
         else:
-            tick -= (tick % PRIVATE_HISTORY_INTERVAL)
             return self.get('../room-history', room=room, time=tick)
 
     def get_shards(self):
@@ -401,9 +725,71 @@ class API(object):
             return self.post('user/activate-ptr')
 
 
+    #### bulk methods
+
+    ## runs func on the client's pool of `concurrency` threads and returns its Future
+    def submit(self, func, *args, **kwargs):
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        return self.executor.submit(func, *args, **kwargs)
+
+    ## fans func out over items on a pool of `concurrency` threads, yielding (item, result) pairs as they
+    ## complete; an item that failed yields its exception as the result so the others are not lost
+    def bulk(self, func, items):
+        from concurrent.futures import as_completed
+        futures = dict((self.submit(func, item), item) for item in items)
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], error if error is not None else future.result()
+
+    def room_objects_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.room_objects(room, shard=shard), rooms)
+
+    def room_terrain_many(self, rooms, encoded=False, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.room_terrain(room, encoded=encoded, shard=shard), rooms)
+
+    def terrain_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.terrain(room, shard=shard), rooms)
+
+    def room_status_many(self, rooms, shard=DEFAULT_SHARD):
+        return self.bulk(lambda room: self.room_status(room, shard=shard), rooms)
+
+    def get_segments(self, segments, shard=DEFAULT_SHARD):
+        return self.bulk(lambda segment: self.get_segment(segment, shard=shard), segments)
+
+    ## yields (tick, chunk) for every history chunk covering ticks start up to (not including) end
+    def history_range(self, room, start, end, shard=DEFAULT_SHARD):
+        interval = self.history_interval
+        ticks = range(start - (start % interval), end, interval)
+        return self.bulk(lambda tick: self.history(room, tick, shard=shard), ticks)
+
+    ## incremental crawl of every room in a shard, see WorldCrawler
+    def crawler(self, shard=DEFAULT_SHARD, **kwargs):
+        from screepsapi.crawler import WorldCrawler
+        return WorldCrawler(self, shard=shard, **kwargs)
+
+    ## batched console expressions with results matched back over a socket, see ConsoleClient
+    def console_client(self, socket, **kwargs):
+        from screepsapi.console import ConsoleClient
+        return ConsoleClient(self, socket, **kwargs)
+
+    ## local market order book refreshed from orders_index, see MarketBook
+    def market_book(self, shard=DEFAULT_SHARD, **kwargs):
+        from screepsapi.market import MarketBook
+        return MarketBook(self, shard=shard, **kwargs)
+
+    ## tick by tick replay of a room, see HistoryReader
+    def history_reader(self, room, start, end, shard=DEFAULT_SHARD, **kwargs):
+        from screepsapi.history import HistoryReader
+        return HistoryReader(self, room, start, end, shard=shard, **kwargs)
+
+
 class Socket(object):
 
-    def __init__(self, user=None, password=None, logging=False, host=None, prefix=None, secure=True, token=None, ptr=False):
+    def __init__(self, user=None, password=None, logging=False, host=None, prefix=None, secure=True, token=None, ptr=False,
+                 ping_interval=DEFAULT_PING_INTERVAL, queue_size=None, workers=1, overflow=DEFAULT_OVERFLOW, track_rooms=False,
+                 reconnect=True, max_backoff=MAX_RECONNECT_BACKOFF, backfill=False):
         prefix = PTR_PREFIX if ptr else prefix
         self.settings = {}
         self.user = user
@@ -415,12 +801,60 @@ class Socket(object):
         self.token = None
         self.user_id = None
         self.atoken = token
+        self.ping_interval = ping_interval
+        self.observers = []
+        self.ws = None
+
+        ## the client used to sign in, kept so reconnects reuse its (rotated) token
+        self.api = None
+
+        ## everything subscribed to, sent again after every successful auth
+        self.subscriptions = set()
+        self.authenticated = False
+
+        ## reconnect after a dropped connection with jittered exponential backoff up to max_backoff seconds
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.interrupt = None
+        self.running = False
+
+        ## with backfill the room ticks missed while disconnected are replayed from room history
+        self.backfill = backfill
+        self.resync = set()
+
+        from screepsapi.dispatch import ChannelIndex, MessageQueue
+        from screepsapi.roomstate import RoomStore
+
+        ## handlers registered with on(), and which of the process_* hooks a subclass implements
+        self.handlers = ChannelIndex()
+        self.hooks = None
+
+        ## with track_rooms every room channel's objects are rebuilt from its diffs in self.rooms
+        self.rooms = RoomStore() if track_rooms or backfill else None
+
+        ## with a queue_size messages are handed from the receive thread to `workers` handler threads
+        self.queue = None
+        if queue_size:
+            self.queue = MessageQueue(queue_size, overflow)
+            for _ in range(workers):
+                worker = threading.Thread(target=self.work)
+                worker.daemon = True
+                worker.start()
 
     def on_error(self, ws, error):
         print(error)
 
-    def on_close(self, ws):
-        self.disconnect()
+    ## websocket-client reports Ctrl-C through on_error and then returns normally, so keep it for connect() to raise
+    def handle_error(self, ws, error):
+        if isinstance(error, (KeyboardInterrupt, SystemExit)):
+            self.interrupt = error
+        self.on_error(ws, error)
+
+    ## newer websocket-client versions also pass the close status and reason
+    def on_close(self, ws, *args):
+        self.authenticated = False
+        if not self.reconnect:
+            self.disconnect()
 
     def on_open(self, ws):
         assert self.token != None
@@ -437,8 +871,18 @@ class Socket(object):
     def subscribe_user(self, watchpoint):
         self.subscribe('user:' + self.user_id + '/' + watchpoint)
 
+    ## subscriptions made before the socket is authenticated are sent once it is
     def subscribe(self, watchpoint):
-        self.ws.send('subscribe ' + watchpoint)
+        if watchpoint in self.subscriptions:
+            return
+        self.subscriptions.add(watchpoint)
+        if self.authenticated:
+            self.ws.send('subscribe ' + watchpoint)
+
+    def unsubscribe(self, watchpoint):
+        self.subscriptions.discard(watchpoint)
+        if self.authenticated:
+            self.ws.send('unsubscribe ' + watchpoint)
 
     def set_subscriptions(self):
         pass
@@ -458,63 +902,240 @@ class Socket(object):
     def process_rawdata(self, ws, data):
         pass
 
+    def observe(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    ## registers handler(ws, channel, data) for a channel or pattern such as 'user:*/memory/*', usable as a decorator
+    def on(self, pattern, handler=None):
+        if handler is None:
+            return lambda handler: self.on(pattern, handler)
+        self.handlers.add(pattern, handler)
+        return handler
+
+    def off(self, pattern, handler=None):
+        self.handlers.remove(pattern, handler)
+
+    def overrides(self, name):
+        if name in self.__dict__:
+            return True
+        for cls in type(self).__mro__:
+            if cls is Socket:
+                return False
+            if name in cls.__dict__:
+                return True
+        return False
+
+    ## whether anything would look at a channel's messages, checked before they are parsed
+    def wants(self, channel):
+        if self.hooks is None:
+            self.hooks = {
+                'raw': hasattr(self, 'process_message') or self.overrides('process_rawdata'),
+                'console': any(self.overrides(n) for n in ('process_log', 'process_results', 'process_error')),
+                'cpu': self.overrides('process_cpu'),
+            }
+        if channel is None or self.hooks['raw']:
+            return True
+        if self.rooms is not None and channel.startswith('room:'):
+            return True
+        if self.hooks['console'] and channel.endswith('console'):
+            return True
+        if self.hooks['cpu'] and channel.endswith('cpu'):
+            return True
+        return len(self.handlers.match(channel)) > 0
+
     def on_message(self, ws, message):
         if (message.startswith('auth ok')):
+            self.resubscribe(ws)
             self.set_subscriptions()
             return
 
+        if (message.startswith('auth failed')):
+            ## the cached token went stale, sign in from scratch on the next connect
+            self.api = None
+            ws.close()
+            return
+
         if (message.startswith('time')):
             return
 
-        if (message.startswith('gz')):
-            message = zlib.decompress(b64decode(message[3:]), 0).decode('utf-8')
+        received = time.time()
+        size = len(message)
+        compressed = message.startswith('gz')
+        if compressed:
+            message = inflate_message(message)
 
-        try:
+        channel = channel_of(message)
+        if not self.wants(channel):
+            return
+
+        event = None
+        if self.observers:
+            from screepsapi.metrics import MessageEvent
+            event = MessageEvent(None, size, compressed=compressed, received=received, decompress_time=time.time() - received)
+
+        if self.queue is not None:
+            self.queue.put(channel, message, (ws, event))
+        else:
+            self.process(ws, message, event=event)
+
+    def process(self, ws, message, data=None, event=None):
+        began = time.time()
+        self.handle_message(ws, message, data)
+        if event is not None:
+            event.channel = data[0] if data is not None else channel_of(message)
+            event.handler_time = time.time() - began
+            for observer in self.observers:
+                observer.message(event)
+
+    ## worker loop draining the message queue into the handlers
+    def work(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                return
+            ws, event = entry.context
+            try:
+                if event is not None:
+                    event.queue_time = time.time() - entry.enqueued
+                message = entry.message if entry.data is None else json.dumps(entry.data)
+                self.process(ws, message, entry.data, event)
+            except Exception as e:
+                self.on_error(ws, e)
+            finally:
+                self.queue.done(entry)
+
+    def handle_message(self, ws, message, data=None):
+        if hasattr(self, 'process_message'):
             self.process_message(ws, message)
             return
-        except AttributeError:
 
+        if data is None:
             try:
-                data = json.loads(message)
-            except:
+                data = loads(message)
+            except ValueError:
                 return
 
-            if data[0].endswith('console'):
-                if 'shard' in data[1]:
-                    shard = data[1]['shard']
-                else:
-                    shard = DEFAULT_SHARD
-
-                if 'messages' in data[1]:
-                    stream = []
-
-                    if 'log' in data[1]['messages']:
-                        for line in data[1]['messages']['log']:
-                            self.process_log(ws, line, shard)
-
-                    if 'results' in data[1]['messages']:
-                        for line in data[1]['messages']['results']:
-                            self.process_results(ws, line, shard)
-
-                if 'error' in data[1]:
-                    self.process_error(ws, data[1]['error'], shard)
-
-            if data[0].endswith('cpu'):
-                self.process_cpu(ws, data[1])
-
-            self.process_rawdata(ws, data)
+        channel = data[0]
+        if self.rooms is not None and channel.startswith('room:'):
+            ## the first message after resubscribing is the whole room again, drop what is gone from it
+            if channel in self.resync:
+                self.resync.discard(channel)
+                state = self.rooms.state(channel)
+                data[1]['objects'] = state.replace_diff(data[1].get('objects') or {})
+            self.rooms.apply(channel, data[1])
+
+        for handler in self.handlers.match(channel):
+            handler(ws, channel, data[1])
+
+        if channel.endswith('console'):
+            if 'shard' in data[1]:
+                shard = data[1]['shard']
+            else:
+                shard = DEFAULT_SHARD
+
+            if 'messages' in data[1]:
+                if 'log' in data[1]['messages']:
+                    for line in data[1]['messages']['log']:
+                        self.process_log(ws, line, shard)
+
+                if 'results' in data[1]['messages']:
+                    for line in data[1]['messages']['results']:
+                        self.process_results(ws, line, shard)
+
+            if 'error' in data[1]:
+                self.process_error(ws, data[1]['error'], shard)
+
+        if channel.endswith('cpu'):
+            self.process_cpu(ws, data[1])
+
+        self.process_rawdata(ws, data)
+
+    ## replays the subscriptions after an auth, backfilling rooms first if the socket reconnected
+    def resubscribe(self, ws):
+        if self.rooms is not None:
+            rooms = [(channel, state) for channel, state in list(self.rooms.rooms.items()) if channel in self.subscriptions]
+            if self.backfill:
+                self.backfill_rooms(ws, rooms)
+            self.resync.update(channel for channel, _ in rooms)
+        self.authenticated = True
+        for watchpoint in sorted(self.subscriptions):
+            ws.send('subscribe ' + watchpoint)
+
+    ## feeds the ticks missed since each room's last message through the handlers as room diffs
+    def backfill_rooms(self, ws, rooms):
+        from screepsapi.history import HistoryReader
+        try:
+            now = self.api.time()
+        except requests.RequestException as e:
+            self.on_error(ws, e)
+            return
+        for channel, state in rooms:
+            if state.game_time is None or state.game_time + 1 >= now:
+                continue
+            reader = HistoryReader(self.api, state.room, state.game_time + 1, now, shard=state.shard or DEFAULT_SHARD)
+            try:
+                for base, chunk in reader.chunks():
+                    ticks = (chunk or {}).get('ticks') or {}
+                    for tick in range(max(base, state.game_time + 1), min(base + self.api.history_interval, now)):
+                        objects = ticks.get(str(tick))
+                        if objects is None:
+                            continue
+                        ## a chunk starts with every object of the room rather than a diff
+                        if tick == base:
+                            objects = state.replace_diff(objects)
+                        data = [channel, {'objects': objects, 'gameTime': tick, 'backfill': True}]
+                        self.process(ws, json.dumps(data) if hasattr(self, 'process_message') else None, data)
+            except requests.RequestException as e:
+                self.on_error(ws, e)
+
+    ## signs in once, later connects reuse the client and its latest token
+    def authenticate(self):
+        if self.api is None:
+            api = API(
+                u=self.user,
+                p=self.password,
+                host=self.host,
+                prefix=self.prefix,
+                secure=self.secure,
+                token=self.atoken)
+            self.user_id = api.me()['_id']
+            self.api = api
+        self.token = self.api.token
+
+    def reconnect_delay(self, failures):
+        return min(DEFAULT_RECONNECT_BACKOFF * 2 ** failures, self.max_backoff) * random.uniform(0.5, 1)
 
     def connect(self):
-        screepsConnection = API(
-            u=self.user,
-            p=self.password,
-            host=self.host,
-            prefix=self.prefix,
-            secure=self.secure,
-            token=self.atoken)
-        me = screepsConnection.me()
-        self.user_id = me['_id']
-        self.token = screepsConnection.token
+        self.running = True
+        failures = 0
+        while self.running:
+            began = time.time()
+            try:
+                self.authenticate()
+                self.run()
+            except requests.RequestException as e:
+                if not self.reconnect:
+                    raise
+                self.on_error(self.ws, e)
+            if self.interrupt is not None:
+                interrupt, self.interrupt = self.interrupt, None
+                self.disconnect()
+                raise interrupt
+            if not self.reconnect or not self.running:
+                break
+            ## a connection that stayed up for a while starts the backoff over
+            failures = failures + 1 if time.time() - began < self.max_backoff else 0
+            time.sleep(self.reconnect_delay(failures))
+
+    def run(self):
+        ## websocket-client and ssl are only loaded by programs that open a socket
+        import ssl
+        import warnings
+        import websocket
+
+        ## Python before 2.7.10 or so has somewhat broken SSL support that throws a warning; suppress it
+        warnings.filterwarnings('ignore', message='.*true sslcontext object.*')
 
         if self.logging:
             logging.getLogger('websocket').addHandler(logging.StreamHandler())
@@ -523,8 +1144,6 @@ class Socket(object):
             logging.getLogger('websocket').addHandler(logging.NullHandler())
             websocket.enableTrace(False)
 
-        prefix = PTR_PREFIX if ptr else prefix
-
         url = 'wss://' if self.secure else 'ws://'
         url += self.host if self.host else OFFICIAL_HOST
         url += self.prefix if self.prefix else ''
@@ -533,19 +1152,21 @@ class Socket(object):
         self.ws = websocket.WebSocketApp(
             url=url,
             on_message=lambda ws, message: self.on_message(ws,message),
-            on_error=lambda ws, error: self.on_error(ws,error),
-            on_close=lambda ws: self.on_close(ws),
+            on_error=lambda ws, error: self.handle_error(ws, error),
+            on_close=lambda ws, *args: self.on_close(ws, *args),
             on_open=lambda ws: self.on_open(ws))
 
         ssl_defaults = ssl.get_default_verify_paths()
         sslopt_ca_certs = {'ca_certs': ssl_defaults.cafile}
         if 'http_proxy' in self.settings and self.settings['http_proxy'] is not None:
             http_proxy_port = self.settings['http_proxy_port'] if 'http_proxy_port' in self.settings else 8080
-            self.ws.run_forever(http_proxy_host=self.settings['http_proxy'], http_proxy_port=http_proxy_port, ping_interval=1, sslopt=sslopt_ca_certs)
+            self.ws.run_forever(http_proxy_host=self.settings['http_proxy'], http_proxy_port=http_proxy_port, ping_interval=self.ping_interval, sslopt=sslopt_ca_certs)
         else:
-            self.ws.run_forever(ping_interval=1, sslopt=sslopt_ca_certs)
+            self.ws.run_forever(ping_interval=self.ping_interval, sslopt=sslopt_ca_certs)
 
     def disconnect(self):
+        self.running = False
+        self.authenticated = False
         if self.ws:
             self.ws.close()
             self.ws = False
@@ -0,0 +1,125 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import os
+import threading
+
+ROOM_SIZE = 50
+TILES = ROOM_SIZE * ROOM_SIZE
+
+## 2 bits per tile, four tiles to a byte
+PACKED_SIZE = TILES // 4
+
+## tile values as used by the encoded room-terrain endpoint and Room.Terrain
+PLAIN = 0
+WALL = 1
+SWAMP = 2
+
+## on disk every record is the room name padded to NAME_SIZE bytes followed by its packed tiles
+NAME_SIZE = 8
+RECORD_SIZE = NAME_SIZE + PACKED_SIZE
+
+
+def pack(encoded):
+    packed = bytearray(PACKED_SIZE)
+    for i in range(TILES):
+        packed[i >> 2] |= (int(encoded[i]) & 3) << ((i & 3) * 2)
+    return bytes(packed)
+
+
+def unpack(packed):
+    packed = bytearray(packed)
+    tiles = bytearray(TILES)
+    for i in range(TILES):
+        tiles[i] = (packed[i >> 2] >> ((i & 3) * 2)) & 3
+    return bytes(tiles)
+
+
+class Terrain(object):
+    __slots__ = ('room', 'packed')
+
+    def __init__(self, room, packed):
+        self.room = room
+        self.packed = bytearray(packed)
+
+    def __getitem__(self, pos):
+        x, y = pos
+        i = y * ROOM_SIZE + x
+        return (self.packed[i >> 2] >> ((i & 3) * 2)) & 3
+
+    def is_wall(self, x, y):
+        return self[x, y] & WALL != 0
+
+    def is_swamp(self, x, y):
+        return self[x, y] == SWAMP
+
+    ## the same digit string returned by room_terrain(encoded=True)
+    def encoded(self):
+        return ''.join(str(t) for t in bytearray(unpack(self.packed)))
+
+    ## 50x50 uint8 array indexed [y, x], requires numpy
+    def array(self):
+        import numpy
+        packed = numpy.frombuffer(self.packed, dtype=numpy.uint8)
+        tiles = (packed[:, None] >> numpy.array([0, 2, 4, 6], dtype=numpy.uint8)) & 3
+        return tiles.reshape(ROOM_SIZE, ROOM_SIZE)
+
+
+class TerrainCache(object):
+    ## Terrain never changes, so rooms are kept for good once fetched. With a path each
+    ## (host, shard) is also persisted as a file of fixed size records that can be memory
+    ## mapped as a whole through world().
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def filename(self, host, shard):
+        return os.path.join(self.path, host.replace(':', '_').replace('/', '_'), '%s.terrain' % shard)
+
+    def load(self, host, shard):
+        key = (host, shard)
+        if key not in self.rooms:
+            rooms = {}
+            if self.path is not None and os.path.exists(self.filename(host, shard)):
+                with open(self.filename(host, shard), 'rb') as f:
+                    data = f.read()
+                for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+                    name = data[offset:offset + NAME_SIZE].rstrip(b'\0').decode('ascii')
+                    rooms[name] = data[offset + NAME_SIZE:offset + RECORD_SIZE]
+            self.rooms[key] = rooms
+        return self.rooms[key]
+
+    def get(self, host, shard, room):
+        with self.lock:
+            packed = self.load(host, shard).get(room)
+        return Terrain(room, packed) if packed is not None else None
+
+    def put(self, host, shard, room, encoded):
+        packed = pack(encoded)
+        with self.lock:
+            rooms = self.load(host, shard)
+            if room in rooms:
+                return Terrain(room, rooms[room])
+            rooms[room] = packed
+            name = room.encode('ascii')
+            ## names of huge private worlds do not fit a record, those rooms are only cached in memory
+            if self.path is not None and len(name) <= NAME_SIZE:
+                filename = self.filename(host, shard)
+                if not os.path.isdir(os.path.dirname(filename)):
+                    os.makedirs(os.path.dirname(filename))
+                with open(filename, 'ab') as f:
+                    f.write(name.ljust(NAME_SIZE, b'\0') + packed)
+        return Terrain(room, packed)
+
+    def __contains__(self, key):
+        host, shard, room = key
+        with self.lock:
+            return room in self.load(host, shard)
+
+    ## memory maps every cached room of a shard as a numpy record array with 'room' and 'tiles' fields
+    def world(self, host, shard):
+        import numpy
+        dtype = numpy.dtype([('room', 'S%d' % NAME_SIZE), ('tiles', numpy.uint8, PACKED_SIZE)])
+        return numpy.memmap(self.filename(host, shard), dtype=dtype, mode='r')
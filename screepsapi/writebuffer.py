@@ -0,0 +1,147 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import atexit
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+
+import requests
+
+from screepsapi.screepsapi import DEFAULT_SHARD
+
+## server side limit on the length of one memory segment
+SEGMENT_LIMIT = 100 * 1024
+
+DEFAULT_WINDOW = 5.0
+
+
+def digest(data):
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+## whether a failed write may succeed if sent again later: connection trouble, throttling or a server error
+def retryable(error):
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+class WriteBuffer(object):
+    ## Write-behind buffer for set_segment and set_memory. Writes to the same segment or memory
+    ## path within `window` seconds collapse into the last one, and a segment whose content hashes
+    ## the same as what was last written is not sent at all. Pending writes go out from a
+    ## background thread once they are `window` seconds old, on flush(), on close() and at exit.
+
+    def __init__(self, api, window=DEFAULT_WINDOW, autoflush=True):
+        self.api = api
+        self.window = window
+        self.pending = OrderedDict()
+        self.written = {}
+        self.sent = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        if autoflush:
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True
+            self.thread.start()
+        atexit.register(self.close)
+
+    def queue(self, key, value, data):
+        with self.lock:
+            ## only segments are skipped: game code rewrites Memory every tick, so a memory path may
+            ## well have changed since this client last wrote the same value to it
+            if data is not None and key not in self.pending and self.written.get(key) == digest(data):
+                self.skipped += 1
+                return False
+            if key in self.pending:
+                self.coalesced += 1
+                queued = self.pending.pop(key)[2]
+            else:
+                queued = time.time()
+            self.pending[key] = (value, data, queued)
+            return True
+
+    ## returns False when the segment already holds exactly this data
+    def set_segment(self, segment, data, shard=DEFAULT_SHARD):
+        if isinstance(data, (dict, list)):
+            data = json.dumps(data, separators=(',', ':'))
+        size = len(data.encode('utf-8'))
+        if size > SEGMENT_LIMIT:
+            raise ValueError('Segment %s is %d bytes, over the %d byte limit' % (segment, size, SEGMENT_LIMIT))
+        return self.queue(('segment', shard, segment), data, data)
+
+    def set_memory(self, path, value, shard=DEFAULT_SHARD):
+        return self.queue(('memory', shard, path), value, None)
+
+    ## records content known to be on the server already, e.g. after get_segment, so it is not rewritten
+    def seed_segment(self, segment, data, shard=DEFAULT_SHARD):
+        with self.lock:
+            self.written[('segment', shard, segment)] = digest(data)
+
+    def write(self, key, value):
+        kind, shard, target = key
+        if kind == 'segment':
+            return self.api.set_segment(target, value, shard=shard)
+        return self.api.set_memory(target, value, shard=shard)
+
+    ## sends pending writes, only those older than the window unless everything is asked for
+    def flush(self, everything=True):
+        cutoff = time.time() - self.window
+        with self.lock:
+            due = [(key, entry) for key, entry in self.pending.items() if everything or entry[2] <= cutoff]
+            for key, _ in due:
+                del self.pending[key]
+        failed = None
+        for index, (key, (value, data, queued)) in enumerate(due):
+            try:
+                self.write(key, value)
+            except Exception as e:
+                failed = failed or e
+                self.on_error(key, e)
+                if not retryable(e):
+                    ## the server rejected this write, sending it again would fail the same way
+                    with self.lock:
+                        self.dropped += 1
+                    continue
+                with self.lock:
+                    ## put back what did not go out unless a newer write replaced it meanwhile
+                    for retry_key, retry_entry in due[index:]:
+                        if retry_key not in self.pending:
+                            self.pending[retry_key] = retry_entry
+                break
+            with self.lock:
+                if data is not None:
+                    self.written[key] = digest(data)
+                self.sent += 1
+        if failed is not None:
+            raise failed
+        return len(due)
+
+    ## called for every failed write, override to log or alert elsewhere
+    def on_error(self, key, error):
+        print('Write to %s %s on %s failed: %s' % (key[0], key[2], key[1], error))
+
+    def run(self):
+        while not self.stopped.wait(min(self.window, 1.0)):
+            try:
+                self.flush(everything=False)
+            except Exception:
+                ## already reported through on_error
+                pass
+
+    def __len__(self):
+        return len(self.pending)
+
+    def close(self):
+        self.stopped.set()
+        if self.pending:
+            self.flush()
@@ -12,7 +12,7 @@ version = '0.5.2'
 setup(
   name = 'screepsapi',
   version = version,
-  packages=find_packages(),
+  packages=find_packages(exclude=['benchmarks']),
 
   description = 'Unofficial client for the Screeps Unofficial API',
   long_description=long_description,
@@ -33,13 +33,27 @@ setup(
   ],
 
   install_requires=[
-    'nose',
-    'requires',
     'requests>=2.10.0,<3',
-    'websocket-client'
+    'websocket-client',
+    'futures; python_version < "3"'
   ],
 
   extras_require={
+    'fast': [
+      'orjson'
+    ],
+    'async': [
+      'websockets'
+    ],
+    'numpy': [
+      'numpy'
+    ],
+    'parquet': [
+      'pyarrow'
+    ],
+    'yaml': [
+      'pyyaml'
+    ],
     'dev': [
       'pypandoc',
       'twine',
@@ -0,0 +1,80 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import threading
+import time
+import unittest
+
+import requests
+
+import screepsapi
+from screepsapi.manager import ClientManager
+
+
+class ThrottledSession(object):
+    ## answers every request with a 429 whose window ends almost at once
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **args):
+        self.calls += 1
+        r = requests.Response()
+        r.status_code = 429
+        r.reason = 'Too Many Requests'
+        r.url = url
+        r.headers['X-RateLimit-Limit'] = '10'
+        r.headers['X-RateLimit-Remaining'] = '0'
+        r.headers['X-RateLimit-Reset'] = str(time.time() + 0.05)
+        return r
+
+    def close(self):
+        pass
+
+
+class APITest(unittest.TestCase):
+
+    def test_repeated_429_raises_after_retries(self):
+        session = ThrottledSession()
+        api = screepsapi.API(token='x' * 40, host='localhost:21025', secure=False, session=session, retries=2)
+        with self.assertRaises(requests.HTTPError) as raised:
+            api.get('game/room-status', room='W1N1')
+        self.assertEqual(raised.exception.response.status_code, 429)
+        self.assertEqual(session.calls, 3)
+
+    def test_bulk_yields_failures_with_the_other_results(self):
+        api = screepsapi.API(token='x' * 40, host='localhost:21025', secure=False, session=ThrottledSession())
+        def func(item):
+            if item == 2:
+                raise ValueError(item)
+            return item * 10
+        results = dict(api.bulk(func, range(4)))
+        api.close()
+        self.assertEqual([results[0], results[1], results[3]], [0, 10, 30])
+        self.assertIsInstance(results[2], ValueError)
+
+
+class ClientManagerTest(unittest.TestCase):
+
+    def test_accounts_on_one_host_share_the_bulk_cap(self):
+        manager = ClientManager(concurrency=2)
+        for name in ('a', 'b', 'c'):
+            manager.add(name, host='localhost:21025', secure=False, token='x' * 40)
+        lock = threading.Lock()
+        running = [0, 0]
+        def func(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+        futures = [manager[name].submit(func, i) for i in range(4) for name in manager.names()]
+        for future in futures:
+            future.result()
+        manager.close()
+        self.assertEqual(running[1], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
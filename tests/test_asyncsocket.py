@@ -0,0 +1,52 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import asyncio
+import json
+import unittest
+
+from screepsapi.asyncsocket import AsyncSocket, Subscription
+
+
+class FakeWebSocket(object):
+    ## replays canned messages as the websockets connection would
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def __aiter__(self):
+        return self.iterate()
+
+    async def iterate(self):
+        for message in self.messages:
+            yield message
+            await asyncio.sleep(0)
+
+
+class AsyncSocketTest(unittest.TestCase):
+
+    def test_slow_subscription_does_not_stall_the_others(self):
+        async def run():
+            socket = AsyncSocket(token='x' * 40, queue_size=2)
+            socket.authed = asyncio.Event()
+            slow = Subscription(socket, 'room:shard0/W1N1', 2)
+            fast = Subscription(socket, 'room:shard0/W2N1', 2)
+            socket.subscriptions = {slow.channel: [slow], fast.channel: [fast]}
+            messages = []
+            for tick in range(10):
+                messages.append(json.dumps([slow.channel, {'gameTime': tick}]))
+                messages.append(json.dumps([fast.channel, {'gameTime': tick}]))
+            socket.ws = FakeWebSocket(messages)
+            reader = asyncio.ensure_future(socket.receive())
+            ticks = [data['gameTime'] async for _, data in fast]
+            await asyncio.wait_for(reader, 1)
+            pending = [data['gameTime'] async for _, data in slow]
+            return ticks, pending, slow.dropped
+        ticks, pending, dropped = asyncio.run(run())
+        self.assertEqual(ticks, list(range(10)))
+        self.assertEqual(pending, [9])
+        self.assertEqual(dropped, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
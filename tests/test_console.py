@@ -0,0 +1,43 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import json
+import shutil
+import subprocess
+import unittest
+
+from screepsapi.console import MARKER, ConsoleClient
+
+NODE = shutil.which('node')
+
+
+## the console expression a client would post for these items, evaluated by node
+def evaluate(expressions, prelude=''):
+    client = ConsoleClient.__new__(ConsoleClient)
+    wrapped = client.wrap('test', [(expression, None, None) for expression in expressions])
+    script = '%s;console.log(%s)' % (prelude, wrapped)
+    line = subprocess.check_output([NODE, '-e', script]).decode('utf-8').strip()
+    assert line.startswith(MARKER + 'test]')
+    return json.loads(line[len(MARKER + 'test]'):])
+
+
+@unittest.skipIf(NODE is None, 'node is not installed')
+class BatchTemplateTest(unittest.TestCase):
+
+    def test_globals_named_like_wrapper_variables(self):
+        results = evaluate(['r', 'e', 'b', 'v', 'x'], prelude='var r=1,e=2,b=3,v=4,x=5')
+        self.assertEqual([results[str(i)]['v'] for i in range(5)], [1, 2, 3, 4, 5])
+
+    def test_declaration_does_not_clobber_other_results(self):
+        results = evaluate(['var r = {}; 1', '2'])
+        self.assertEqual(results['0']['v'], 1)
+        self.assertEqual(results['1']['v'], 2)
+
+    def test_failure_is_isolated(self):
+        results = evaluate(['throw new Error("boom")', '1+1'])
+        self.assertIn('boom', results['0']['e'])
+        self.assertEqual(results['1']['v'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
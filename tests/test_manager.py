@@ -0,0 +1,44 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from screepsapi.manager import TokenStore
+
+
+class TokenStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tokens.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def stored(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_rotations_within_the_interval_are_saved_once(self):
+        store = TokenStore(self.path, interval=60)
+        store.set('main', 'a')
+        store.set('main', 'b')
+        store.set('main', 'c')
+        self.assertEqual(self.stored(), {'main': 'a'})
+        store.close()
+        self.assertEqual(self.stored(), {'main': 'c'})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_context_manager_saves_on_exit(self):
+        with TokenStore(self.path, interval=60) as store:
+            store.set('main', 'a')
+            store.set('other', 'b')
+        self.assertEqual(TokenStore(self.path).get('other'), 'b')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import time
+import unittest
+
+from screepsapi.ratelimit import DEFAULT_PENALTY, RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_headerless_429_backs_off_once(self):
+        limiter = RateLimiter()
+        limiter.acquire('GET', 'game/time')
+        limiter.release('GET', 'game/time', None, throttled=True)
+        began = time.time()
+        for _ in range(5):
+            limiter.acquire('GET', 'game/time')
+            limiter.release('GET', 'game/time', None)
+        elapsed = time.time() - began
+        self.assertGreaterEqual(elapsed, DEFAULT_PENALTY * 0.9)
+        self.assertLess(elapsed, DEFAULT_PENALTY * 2)
+        self.assertIsNone(limiter.headroom('GET', 'game/time'))
+
+    def test_headerless_calls_after_rollover_do_not_stall(self):
+        limiter = RateLimiter()
+        limiter.acquire('GET', 'x')
+        limiter.release('GET', 'x', {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': '5',
+                                     'X-RateLimit-Reset': str(time.time() + 0.1)})
+        time.sleep(0.2)
+        for _ in range(5):
+            limiter.acquire('GET', 'x')
+            limiter.release('GET', 'x', None)
+        began = time.time()
+        limiter.acquire('GET', 'x')
+        self.assertLess(time.time() - began, DEFAULT_PENALTY * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
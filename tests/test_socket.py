@@ -0,0 +1,36 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import unittest
+
+import screepsapi
+
+
+class InterruptedSocket(screepsapi.Socket):
+    ## stands in for a websocket-client run that reports Ctrl-C through on_error and returns
+
+    runs = 0
+
+    def authenticate(self):
+        pass
+
+    def run(self):
+        self.runs += 1
+        self.handle_error(None, KeyboardInterrupt())
+
+    def on_error(self, ws, error):
+        pass
+
+
+class SocketTest(unittest.TestCase):
+
+    def test_keyboard_interrupt_stops_reconnecting(self):
+        sock = InterruptedSocket(token='x' * 40, reconnect=True)
+        with self.assertRaises(KeyboardInterrupt):
+            sock.connect()
+        self.assertEqual(sock.runs, 1)
+        self.assertFalse(sock.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# Copyright @dzhu, @tedivm, @admon84
+# https://github.com/screepers/python-screeps
+
+import unittest
+
+from screepsapi.writebuffer import WriteBuffer
+
+
+class RecordingAPI(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def set_segment(self, segment, data, shard=None):
+        self.calls.append(('segment', segment, data))
+        return {'ok': 1}
+
+    def set_memory(self, path, value, shard=None):
+        self.calls.append(('memory', path, value))
+        return {'ok': 1}
+
+
+class WriteBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = RecordingAPI()
+        self.buffer = WriteBuffer(self.api, autoflush=False)
+
+    def tearDown(self):
+        self.buffer.close()
+
+    def test_memory_written_back_to_earlier_value_is_sent(self):
+        for value in ('A', 'B', 'A'):
+            self.assertTrue(self.buffer.set_memory('stats.state', value))
+            self.buffer.flush()
+        self.assertEqual(self.api.calls, [('memory', 'stats.state', v) for v in ('A', 'B', 'A')])
+
+    def test_memory_writes_within_a_window_coalesce(self):
+        self.buffer.set_memory('stats.tick', 1)
+        self.buffer.set_memory('stats.tick', 2)
+        self.buffer.flush()
+        self.assertEqual(self.api.calls, [('memory', 'stats.tick', 2)])
+
+    def test_unchanged_segment_is_skipped(self):
+        self.buffer.set_segment(1, 'data')
+        self.buffer.flush()
+        self.assertFalse(self.buffer.set_segment(1, 'data'))
+        self.buffer.flush()
+        self.assertEqual(len(self.api.calls), 1)
+
+    def test_oversized_segment_raises(self):
+        self.assertRaises(ValueError, self.buffer.set_segment, 1, 'x' * (100 * 1024 + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()